@@ -1,4 +1,10 @@
+import numpy as np
+
 # Add your own algorithm here
+# Algorithms can use either interface:
+#   - the object interface, next_floor(building, elevator, origins, destinations), like BasicAlgorithm below
+#   - the array interface, next_floor(view), used by the built-in algorithms. Set array_api = True and the
+#     DecisionView passed in has numpy arrays of who is waiting where, which is much faster for big buildings
 
 class BasicAlgorithm:
     def __init__(self):
@@ -10,108 +16,125 @@ class BasicAlgorithm:
     def next_floor(self, building, elevator, origins, destinations):
         # All the properties of the elevator, passenger or building class can be used to determine the next floor along
         # with the origins and destinations dictionary.
-        # These dictionaries have the floors of the building as keys and the values are a list of the passengers waiting
-        # or wanting to go there
+        # These dictionaries have the floors of the building as keys and the values are the passengers waiting or
+        # wanting to go there, in the order they arrived - they can be iterated, indexed and counted like lists
+        # building.state keeps counts of who is waiting where, which is much faster than searching these dictionaries
 
         if elevator.occupants:  # If there are people in the elevator
             return elevator.occupants[
                 0].destination  # Just go to the floor of the destination of the first person in the list of occupants
-        elif bool([x for x in destinations.values() if x != []]):  # If there are people waiting for the lift
-            return [x for x in destinations.values() if x != []][0][0].origin  # Go to where the someone is waiting
+        elif building.state.pending():  # If there are people waiting for the lift
+            return next(x for x in destinations.values() if x)[0].origin  # Go to where the someone is waiting
         else:
             return round(building.floors / 2)  # Go to middle floor if no one is waiting/needs dropping off
 
 
+class ObjectAlgorithm:
+    # Adapter that lets an algorithm written for the object interface be used wherever the array interface is expected
+    array_api = True
+
+    def __init__(self, algo):
+        self.algo = algo
+        self.name = algo.name
+        self.only_pickup_directional_passengers = getattr(algo, "only_pickup_directional_passengers", False)
+
+    def next_floor(self, view):
+        return self.algo.next_floor(view.building, view.elevator, view.origins, view.destinations)
+
+
+def as_array_algorithm(algo):
+    if getattr(algo, "array_api", False):
+        return algo
+    return ObjectAlgorithm(algo)
+
+
+def nearest_floor(floors, position):
+    # Closest of the given (ascending) floors to the position, the lower one if two are as close, or None if there are none
+    if not len(floors):
+        return None
+    return int(floors[np.argmin(np.abs(floors - position))])
+
+
 class SimpleUpDown:  # Ollie
+    array_api = True
+
     def __init__(self):
         self.name = "SimpleUpDown"
         self.only_pickup_directional_passengers = False
 
-    def next_floor(self, building, elevator, origins, destinations):
-        current_direction = elevator.direction
-        current_floor = elevator.position
+    def next_floor(self, view):
+        current_direction = view.direction
+        current_floor = view.position
 
         if not current_direction and current_floor == 0:
             return 1
 
-        if current_floor == 0 or current_floor == building.floors - 1:
+        if current_floor == 0 or current_floor == view.floors - 1:
             return current_floor - current_direction
         else:
             return current_floor + current_direction
 
 
 class ClosestFloor:  # Max
+    array_api = True
+
     def __init__(self):
         self.name = "ClosestFloor"
         self.only_pickup_directional_passengers = False
 
-    def next_floor(self, building, elevator, origins, destinations):
-        closest_floor_waiting = None
+    def next_floor(self, view):
         current_closest = 1e10  # big number
 
-        if not elevator.occupants and not bool([x for x in destinations.values() if x != []]):
+        if not view.n_occupants and not view.pending:
             return 0
 
-        if elevator.occupants:  # calculates closest drop off floor
-            for passenger in elevator.occupants:
-                closest_floor_destination = abs(elevator.position - passenger.destination)
-                if closest_floor_destination < abs(elevator.position - current_closest):
-                    current_closest = passenger.destination
+        if view.n_occupants:  # calculates closest drop off floor
+            current_closest = view.closest_drop_off()
 
-        if len(elevator.occupants) != elevator.max_occupancy:  # Only go to pickup floor if lift is not full
-            for floor, passengers_waiting in origins.items():  # calculates nearest passenger whos called the elevator
-                if len(passengers_waiting) > 0:
-                    closest_floor_waiting = abs(elevator.position - floor)
-                    if closest_floor_waiting < abs(
-                            elevator.position - current_closest):  # determines whether drop off or pick up is closer
-                        current_closest = floor
+        if not view.full:  # Only go to pickup floor if lift is not full
+            closest_floor_waiting = nearest_floor(np.flatnonzero(view.calls), view.position)  # nearest passenger whos called the elevator
+            if closest_floor_waiting is not None and abs(view.position - closest_floor_waiting) < abs(
+                    view.position - current_closest):  # determines whether drop off or pick up is closer
+                current_closest = closest_floor_waiting
 
         return current_closest
 
 
 class NormalLift:  # Cameron
+    array_api = True
+
     def __init__(self):
         self.name = "NormalLift"
         self.only_pickup_directional_passengers = True
 
-    def next_floor(self, building, elevator, origins, destinations):
-        current_floor = elevator.position
-
-        origins = {floor: [passenger for passenger in passengers if passenger.direction == elevator.direction] for
-                   floor, passengers in origins.items() if passengers != []}
-        destinations = {floor: [passenger for passenger in elevator.occupants if floor == passenger.destination] for
-                        floor in range(building.floors)}
-        destinations = {floor: passengers for floor, passengers in destinations.items() if passengers != []}
+    def next_floor(self, view):
+        current_floor = view.position
 
-        if len(elevator.occupants) == elevator.max_occupancy:
-            potentialStops = destinations
+        if view.full:
+            potentialStops = view.occupant_destinations > 0
         else:
-            potentialStops = {**origins, **destinations}
+            potentialStops = view.calls | (view.occupant_destinations > 0)  # Floors with passengers waiting or to drop off
 
-        if elevator.direction:
-            current_direction = elevator.direction
+        if view.direction:
+            current_direction = view.direction
         else:
             current_direction = 1
 
-        try:
-            lowestFloorAbove = min(i for i in potentialStops.keys() if i > current_floor)
-        except:
-            lowestFloorAbove = current_floor
+        stops_above = np.flatnonzero(potentialStops[current_floor + 1:])
+        stops_below = np.flatnonzero(potentialStops[:current_floor])
 
-        try:
-            highestFloorBelow = max(i for i in potentialStops.keys() if i < current_floor)
-        except:
-            highestFloorBelow = current_floor
+        lowestFloorAbove = current_floor + 1 + int(stops_above[0]) if len(stops_above) else current_floor
+        highestFloorBelow = int(stops_below[-1]) if len(stops_below) else current_floor
 
         if current_direction == 1:
-            if any(a > current_floor for a in potentialStops.keys()):
+            if len(stops_above):
                 return lowestFloorAbove
 
             else:
                 return highestFloorBelow
 
         elif current_direction == -1:
-            if any(a < current_floor for a in potentialStops.keys()):
+            if len(stops_below):
                 return highestFloorBelow
 
             else:
@@ -119,36 +142,31 @@ class NormalLift:  # Cameron
 
 
 class LongestWaited:  # Rachel
+    array_api = True
+
     def __init__(self):
         self.name = "LongestWaited"
         self.only_pickup_directional_passengers = False
 
-    def next_floor(self, building, elevator, origins, destinations):
+    def next_floor(self, view):
         # longest waited for elevator
         earliest_journey_start = 1e10
         longest_waited_floor = None
 
-        for floor, passengers_waiting in origins.items():
-            for passenger in passengers_waiting:
-                if passenger.journey_start < earliest_journey_start:
-                    earliest_journey_start = passenger.journey_start
-                    longest_waited_floor = floor
-
-        elevator_earliest_journey_start = 1e10
-        elevator_longest_waited_floor = None
+        earliest = np.min(view.oldest_waiting)
+        if earliest != np.inf:
+            longest_waited_floor = int(np.argmin(view.oldest_waiting))
+            earliest_journey_start = earliest
 
-        for passenger in elevator.occupants:
-            if passenger.journey_start < elevator_earliest_journey_start:
-                elevator_earliest_journey_start = passenger.journey_start
-                elevator_longest_waited_floor = passenger.destination
+        elevator_earliest_journey_start, elevator_longest_waited_floor = view.oldest_occupant()
 
-        if elevator.max_occupancy == len(elevator.occupants):
+        if view.full:
             return elevator_longest_waited_floor
 
-        if not elevator.occupants and not bool([x for x in destinations.values() if x != []]):
+        if not view.n_occupants and not view.pending:
             return 0
 
-        if not elevator.occupants and bool([x for x in destinations.values() if x != []]):
+        if not view.n_occupants and view.pending:
             return longest_waited_floor
         else:
             if elevator_earliest_journey_start <= earliest_journey_start:
@@ -158,66 +176,41 @@ class LongestWaited:  # Rachel
 
 
 class PopularFloor:  # Conrad
+    array_api = True
 
     def __init__(self):
         self.name = "PopularFloor"
         self.only_pickup_directional_passengers = False
 
-    def next_floor(self, building, elevator, origins, destinations):
-        n_destinations_occupants = [0 for floor in range(
-            building.floors)]  # Create an empty array of the correct length for the floors to be used for occupants of lift
+    def next_floor(self, view):
+        n_destinations_occupants = view.occupant_destinations  # Number of occupants of the lift going to each floor
 
-        n_destinations_waiting_passengers = [0 for floor in range(
-            building.floors)]  # Creates the same array as above, but to be used for passengers waiting for lift
+        n_destinations_waiting_passengers = view.waiting_destinations  # Number of passengers waiting for lift going to each floor
 
-        most_popular_destination_occupants = None  # Most Popular floor for passengers currently in the lift
-
-        most_popular_destination_passengers = None  # Most Popular Floor for waiting passengers
-
-        if not elevator.occupants and not bool([x for x in destinations.values() if x != []]):
+        if not view.n_occupants and not view.pending:
 
             return round(
-                building.floors / 2)  # If no one in elevator and no one waiting, go to middle floor ( i think )
-
-        elif not elevator.occupants and bool(
-                [x for x in destinations.values() if x != []]):  # If no occupants but people waiting then :
+                view.floors / 2)  # If no one in elevator and no one waiting, go to middle floor ( i think )
 
-            for floor, passengers_waiting in origins.items():
-                for passenger in passengers_waiting:
-                    n_destinations_waiting_passengers[passenger.destination] += 1
+        elif not view.n_occupants and view.pending:  # If no occupants but people waiting then :
 
-            most_popular_destination_passengers = n_destinations_waiting_passengers.index(
-                max(n_destinations_waiting_passengers))
+            most_popular_destination_passengers = int(np.argmax(n_destinations_waiting_passengers))
 
-            n_passengers_origin_for_destination = [0 for floor in range(building.floors)]
+            n_passengers_origin_for_destination = view.waiting_routes[:, most_popular_destination_passengers]
 
-            for floor, passengers_waiting in origins.items():
-                for passenger in passengers_waiting:
-                    if passenger.destination == most_popular_destination_passengers:
-                        n_passengers_origin_for_destination[passenger.origin] += 1
-
-            most_popular_origin_for_destination = n_passengers_origin_for_destination.index(
-                max(n_passengers_origin_for_destination))
+            most_popular_origin_for_destination = int(np.argmax(n_passengers_origin_for_destination))
 
             return most_popular_origin_for_destination
         else:  # Passengers in elevator
-            for passenger in elevator.occupants:
-                n_destinations_occupants[passenger.destination] += 1
-
-            most_popular_destination_occupants = n_destinations_occupants.index(max(n_destinations_occupants))
+            most_popular_destination_occupants = int(np.argmax(n_destinations_occupants))
 
-            if elevator.max_occupancy == len(elevator.occupants):
+            if view.full:
                 return most_popular_destination_occupants
 
-            n_passengers_origin_for_destination = [0 for floor in range(building.floors)]
-
-            for floor, passengers_waiting in origins.items():
-                for passenger in passengers_waiting:
-                    if passenger.destination == most_popular_destination_occupants:
-                        n_passengers_origin_for_destination[passenger.origin] += 1
+            n_passengers_origin_for_destination = view.waiting_routes[:, most_popular_destination_occupants]
 
-            for floor in range(elevator.position, most_popular_destination_occupants):
-                if n_passengers_origin_for_destination[floor]:
-                    return floor
+            for floor in np.flatnonzero(n_passengers_origin_for_destination[
+                                        view.position:most_popular_destination_occupants]).tolist():
+                return view.position + floor  # First floor on the way with someone going to the same place
 
             return most_popular_destination_occupants
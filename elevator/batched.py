@@ -0,0 +1,277 @@
+import numpy as np
+
+from elevator.algorithms import SimpleUpDown, ClosestFloor, NormalLift, LongestWaited, PopularFloor
+from elevator.classes import Building
+from elevator.traces import single_lift_run
+
+# Passenger status in a batch
+FUTURE = 0  # Not arrived yet
+WAITING = 1
+RIDING = 2
+DONE = 3  # Reached their destination, or padding for runs with fewer passengers
+
+
+def supports(config, algo):
+    return type(algo) in DECISIONS and single_lift_run(config)
+
+
+def run_batch(config, algo, traces):
+    # Advances one simulation per trace in lockstep, with the state of every run held as (runs x ...) arrays so each
+    # iteration is a handful of numpy operations however many runs there are. Gives the same results as run_ticks
+    batch = Batch(config, algo, traces)
+    while batch.step():
+        pass
+    return batch.results()
+
+
+class Batch:
+    def __init__(self, config, algo, traces):
+        building = Building(config['n_floors'], config['storey_height'])
+        self.floors = building.floors
+        self.floor_numbers = np.arange(self.floors)
+        self.travel_times = building.travel_time_table(config['acceleration'], config['max_speed'])
+        self.max_occupancy = config['max_occupancy']
+        self.embark_disembark_time = config['embark_disembark_time']
+        self.directional = algo.only_pickup_directional_passengers
+        self.decide = DECISIONS[type(algo)]
+
+        runs = len(traces)
+        self.lengths = [len(trace) for trace in traces]
+        n_passengers = max(self.lengths, default=0)
+
+        # Passengers of every run, padded to the longest run with passengers that are already done
+        self.origin = np.zeros((runs, n_passengers), dtype=np.int64)
+        self.destination = np.zeros((runs, n_passengers), dtype=np.int64)
+        self.arrival_step = np.full((runs, n_passengers), np.iinfo(np.int64).max, dtype=np.int64)
+        self.status = np.full((runs, n_passengers), DONE, dtype=np.int8)
+        for k, trace in enumerate(traces):
+            self.origin[k, :len(trace)] = trace.origin
+            self.destination[k, :len(trace)] = trace.destination
+            self.arrival_step[k, :len(trace)] = trace.step
+            self.status[k, :len(trace)] = FUTURE
+        self.direction_of = np.where(self.origin < self.destination, 1, -1)
+        self.remaining = np.array(self.lengths, dtype=np.int64)  # Passengers of each run not at their destination yet
+
+        # Each step only looks at the columns from the first passenger some run still has to deliver (lo) to the
+        # last that has arrived in any run (hi), so it costs the same however many are still to come or are done.
+        # Every run's arrivals are in order, so the first iteration anyone arrives in each column never goes down
+        self.column_start = self.arrival_step.min(axis=0, initial=np.iinfo(np.int64).max)
+        self.lo = 0
+        self.hi = 0
+
+        self.journey_start = np.full((runs, n_passengers), np.nan)
+        self.get_on = np.full((runs, n_passengers), np.nan)
+        self.get_off = np.full((runs, n_passengers), np.nan)
+
+        # Lift of every run
+        self.occupants = np.full((runs, max(self.max_occupancy, 1)), -1, dtype=np.int64)  # In the order they got on
+        self.n_occupants = np.zeros(runs, dtype=np.int64)
+        self.position = np.zeros(runs, dtype=np.int64)
+        self.direction = np.zeros(runs, dtype=np.int64)
+        self.time = np.zeros(runs)
+
+        self.rows = np.arange(runs)[:, None]
+        self.iteration = 0
+
+    def step(self):
+        # One iteration of every unfinished run, returns False once they have all finished
+        active = self.remaining > 0
+        if not active.any():
+            return False
+
+        position = self.position[:, None]
+
+        self.hi = int(np.searchsorted(self.column_start, self.iteration, side='right'))
+        finished = (self.status[:, self.lo:self.hi] == DONE).all(axis=0)
+        self.lo += len(finished) if finished.all() else int(np.argmin(finished))
+        status = self.current(self.status)
+
+        arriving = (status == FUTURE) & (self.current(self.arrival_step) <= self.iteration)
+        status[arriving] = WAITING
+        self.current(self.journey_start)[arriving] = np.broadcast_to(self.time[:, None], arriving.shape)[arriving]
+
+        # Passengers get off
+        valid = self.occupants >= 0
+        exits = valid & (self.occupant_destinations() == position)
+        exit_rows, exit_slots = np.nonzero(exits)
+        exit_passengers = self.occupants[exit_rows, exit_slots]
+        self.status[exit_rows, exit_passengers] = DONE
+        self.get_off[exit_rows, exit_passengers] = self.time[exit_rows]
+        n_exit = exits.sum(axis=1)
+        self.remaining -= n_exit
+
+        keep = valid & ~exits
+        order = np.argsort(~keep, axis=1, kind='stable')
+        self.occupants = np.take_along_axis(np.where(keep, self.occupants, -1), order, axis=1)
+        self.n_occupants = keep.sum(axis=1)
+
+        # Passengers get on, in the order they arrived
+        direction_of = self.current(self.direction_of)
+        at_floor = (status == WAITING) & (self.current(self.origin) == position)
+        n_waiting = at_floor.sum(axis=1)
+        both_directions = (at_floor & (direction_of == 1)).any(axis=1) & \
+                          (at_floor & (direction_of == -1)).any(axis=1)
+
+        opposite = ((self.occupants >= 0) &
+                    (np.sign(self.occupant_destinations() - position) == -self.direction[:, None])).any(axis=1)
+        take_all_passengers = ~both_directions & ((self.n_occupants == 0) | opposite)
+
+        if self.directional:
+            anyone = (self.position == 0) | (self.position == self.floors - 1) | take_all_passengers
+            eligible = at_floor & ((direction_of == self.direction[:, None]) | anyone[:, None])
+        else:
+            eligible = at_floor
+
+        queue_position = np.cumsum(eligible, axis=1)
+        boarded = eligible & (queue_position <= (self.max_occupancy - self.n_occupants)[:, None])
+        board_rows, board_columns = np.nonzero(boarded)
+        board_passengers = board_columns + self.lo
+        self.status[board_rows, board_passengers] = RIDING
+        self.get_on[board_rows, board_passengers] = self.time[board_rows]
+        slots = self.n_occupants[board_rows] + queue_position[board_rows, board_columns] - 1
+        self.occupants[board_rows, slots] = board_passengers
+        self.n_occupants += boarded.sum(axis=1)
+
+        # Pick the next floor and move there
+        next_floor = np.where(active, self.decide(self), self.position)
+
+        previous_floor = self.position
+        turn = next_floor == self.position  # Turns round, like run_iteration
+        self.direction = np.where(active, np.where(turn, -self.direction, np.sign(next_floor - self.position)),
+                                  self.direction)
+        self.position = next_floor
+        self.time += np.where(active, (n_waiting + n_exit) * self.embark_disembark_time +
+                              self.travel_times[previous_floor, next_floor], 0)
+
+        self.iteration += 1
+        return True
+
+    def results(self):
+        # Journey and in lift times of every run
+        journey_times = self.get_off - self.journey_start
+        in_elevator_times = self.get_off - self.get_on
+        return [(journey_times[k, :n], in_elevator_times[k, :n]) for k, n in enumerate(self.lengths)]
+
+    def current(self, array):
+        # The columns of a (runs x passengers) array between lo and hi, which hold every passenger waiting or riding
+        return array[:, self.lo:self.hi]
+
+    def occupant_destinations(self):
+        return np.where(self.occupants >= 0, self.destination[self.rows, np.maximum(self.occupants, 0)], -1)
+
+    def count_by_floor(self, mask, floor_of):
+        # Number of passengers in mask on each floor of every run, indexed [run, floor]
+        rows = np.broadcast_to(self.rows, mask.shape)
+        index = rows[mask] * self.floors + floor_of[mask]
+        return np.bincount(index, minlength=len(mask) * self.floors).reshape(len(mask), self.floors)
+
+    def waiting(self):
+        return self.count_by_floor(self.current(self.status) == WAITING, self.current(self.origin))
+
+    def riding(self):
+        return self.count_by_floor(self.current(self.status) == RIDING, self.current(self.destination))
+
+    def pending(self):
+        status = self.current(self.status)
+        return ((status == WAITING) | (status == RIDING)).any(axis=1)
+
+    def full(self):
+        return self.n_occupants == self.max_occupancy
+
+    def nearest(self, mask):
+        # Nearest floor where mask is set for every run, the lower one if two are as close, and whether there is one
+        distance = np.where(mask, np.abs(self.floor_numbers - self.position[:, None]), self.floors)
+        return np.argmin(distance, axis=1), mask.any(axis=1)
+
+
+# Batched versions of the built-in algorithms, each returning the next floor of every run
+
+def simple_up_down(batch):
+    position, direction = batch.position, batch.direction
+    at_end = (position == 0) | (position == batch.floors - 1)
+    return np.where((direction == 0) & (position == 0), 1,
+                    np.where(at_end, position - direction, position + direction))
+
+
+def closest_floor(batch):
+    position = batch.position
+    occupant_destinations = batch.occupant_destinations()
+    distance = np.where(batch.occupants >= 0, np.abs(occupant_destinations - position[:, None]), np.inf)
+    first_closest = np.argmin(distance, axis=1)  # Of the occupants going to the closest floor, whoever got on first
+    closest_drop_off = occupant_destinations[np.arange(len(distance)), first_closest]
+    current_closest = np.where(batch.n_occupants > 0, closest_drop_off, 10 ** 10)
+
+    closest_floor_waiting, anyone_waiting = batch.nearest(batch.waiting() > 0)
+    pick_up = ~batch.full() & anyone_waiting & \
+              (np.abs(position - closest_floor_waiting) < np.abs(position - current_closest))
+    current_closest = np.where(pick_up, closest_floor_waiting, current_closest)
+
+    return np.where((batch.n_occupants == 0) & ~batch.pending(), 0, current_closest)
+
+
+def normal_lift(batch):
+    position = batch.position[:, None]
+    riding = batch.riding() > 0
+    potential_stops = np.where(batch.full()[:, None], riding, (batch.waiting() > 0) | riding)
+
+    above = potential_stops & (batch.floor_numbers > position)
+    below = potential_stops & (batch.floor_numbers < position)
+    any_above, any_below = above.any(axis=1), below.any(axis=1)
+    lowest_floor_above = np.where(any_above, np.argmax(above, axis=1), batch.position)
+    highest_floor_below = np.where(any_below, batch.floors - 1 - np.argmax(below[:, ::-1], axis=1), batch.position)
+
+    current_direction = np.where(batch.direction != 0, batch.direction, 1)
+    return np.where(current_direction == 1, np.where(any_above, lowest_floor_above, highest_floor_below),
+                    np.where(any_below, highest_floor_below, lowest_floor_above))
+
+
+def longest_waited(batch):
+    waiting = batch.current(batch.status) == WAITING
+    rows = np.broadcast_to(batch.rows, waiting.shape)
+    oldest_waiting = np.full((len(waiting), batch.floors), np.inf)
+    np.minimum.at(oldest_waiting, (rows[waiting], batch.current(batch.origin)[waiting]),
+                  batch.current(batch.journey_start)[waiting])
+    longest_waited_floor = np.argmin(oldest_waiting, axis=1)
+    earliest_journey_start = np.min(oldest_waiting, axis=1)
+    earliest_journey_start = np.where(earliest_journey_start == np.inf, 1e10, earliest_journey_start)
+
+    valid = batch.occupants >= 0
+    occupant_starts = np.where(valid, batch.journey_start[batch.rows, np.maximum(batch.occupants, 0)], np.inf)
+    oldest_occupant = np.argmin(occupant_starts, axis=1)  # First of the occupants who have been travelling longest
+    elevator_earliest_journey_start = np.where(valid.any(axis=1), np.min(occupant_starts, axis=1), 1e10)
+    elevator_longest_waited_floor = batch.occupant_destinations()[np.arange(len(valid)), oldest_occupant]
+
+    no_occupants = batch.n_occupants == 0
+    return np.where(batch.full(), elevator_longest_waited_floor,
+                    np.where(no_occupants & ~batch.pending(), 0,
+                             np.where(no_occupants, longest_waited_floor,
+                                      np.where(elevator_earliest_journey_start <= earliest_journey_start,
+                                               elevator_longest_waited_floor, longest_waited_floor))))
+
+
+def popular_floor(batch):
+    waiting = batch.current(batch.status) == WAITING
+    origin, destination = batch.current(batch.origin), batch.current(batch.destination)
+
+    def origins_going_to(floor):
+        # Waiting passengers going to the given floor of each run, counted by the floor they are waiting on
+        return batch.count_by_floor(waiting & (destination == floor[:, None]), origin)
+
+    most_popular_destination_passengers = np.argmax(batch.count_by_floor(waiting, destination), axis=1)
+    most_popular_origin_for_destination = np.argmax(origins_going_to(most_popular_destination_passengers), axis=1)
+
+    most_popular_destination_occupants = np.argmax(batch.riding(), axis=1)
+    on_the_way = (origins_going_to(most_popular_destination_occupants) > 0) & \
+                 (batch.floor_numbers >= batch.position[:, None]) & \
+                 (batch.floor_numbers < most_popular_destination_occupants[:, None])
+    first_on_the_way = np.where(on_the_way.any(axis=1), np.argmax(on_the_way, axis=1),
+                                most_popular_destination_occupants)
+
+    no_occupants = batch.n_occupants == 0
+    return np.where(no_occupants, np.where(batch.pending(), most_popular_origin_for_destination,
+                                           round(batch.floors / 2)),
+                    np.where(batch.full(), most_popular_destination_occupants, first_on_the_way))
+
+
+DECISIONS = {SimpleUpDown: simple_up_down, ClosestFloor: closest_floor, NormalLift: normal_lift,
+             LongestWaited: longest_waited, PopularFloor: popular_floor}
@@ -0,0 +1,330 @@
+import argparse
+import json
+import numpy as np
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from elevator.algorithms import SimpleUpDown, ClosestFloor, NormalLift, LongestWaited, PopularFloor
+from elevator.functions import run_engine
+from elevator.results import ResultSink
+from elevator.traces import Trace, generate_trace
+
+ALGORITHMS = [SimpleUpDown, ClosestFloor, NormalLift, LongestWaited, PopularFloor]
+
+FLOORS = [4, 20, 100, 500]
+PASSENGERS = [100, 1000]
+QUICK_FLOORS = [4, 20]
+QUICK_PASSENGERS = [100]
+
+SEED = 20210901  # Every workload is generated from this seed so runs of the benchmark are comparable
+RESULT_ITERATIONS = 100  # Simulations worth of results written when timing the result sink
+SAMPLE_TIME = 0.2  # Each timing sample repeats the workload until it has run for at least this long (s)
+MIN_TIME_DIFFERENCE = 0.002  # Seconds a timing must rise by, as well as by the tolerance, to count as a regression
+MIN_MEMORY_DIFFERENCE = 2 ** 18  # Bytes peak memory must rise by, as well as by the tolerance, to count as a regression
+
+QUEUE_LENGTHS = [10, 100, 1000, 10000]  # Passengers waiting on one floor in the queue benchmark
+QUEUE_FLOORS = 20
+MAX_QUEUE_GROWTH = 2.0  # Most the time per tick may grow from the shortest queue to the longest before it counts as a regression
+
+# Modules a worker process imports to simulate - they should load nothing but the standard library and NumPy
+CORE_MODULES = ['elevator.classes', 'elevator.algorithms', 'elevator.engine', 'elevator.functions', 'main']
+HEAVY_MODULES = ['numba', 'matplotlib', 'pandas', 'seaborn']  # Only loaded once charts, tables or the compiled engine are used
+IMPORT_BUDGET = 0.1  # Most seconds importing a core module may take on top of NumPy in a fresh interpreter
+
+# Scenario every workload is built from - the floors, passengers and algorithm are filled in per workload
+BASE_CONFIG = dict(
+    mode="morning",
+    draw=False,
+    max_occupancy=12,
+    generate_range=(0, 2),
+    acceleration=1.5,
+    max_speed=6.7,
+    storey_height=4,
+    embark_disembark_time=1,
+    n_cars=1,
+)
+
+
+def workloads(floors, passengers, algos, engine):
+    # Every combination of building size, passenger count and algorithm, each seeded by its size so a workload gets
+    # the same passengers whichever others are run with it
+    for n_floors in floors:
+        for n_passengers in passengers:
+            seed = np.random.SeedSequence([SEED, n_floors, n_passengers])
+            for algo_class in algos:
+                config = dict(BASE_CONFIG, n_floors=n_floors, n_passengers=n_passengers, engine=engine)
+                yield f"{algo_class.__name__}_{n_floors}f_{n_passengers}p", config, algo_class, seed
+
+
+def prepare_workload(config, algo_class, seed):
+    # Runs the workload once for its results and once more under tracemalloc for its peak memory. Returns what it
+    # measured, and functions that simulate it and write its results for timing
+    trace = generate_trace(config, np.random.default_rng(seed))
+    total_passengers = run_engine(config, algo_class(), trace)
+
+    tracemalloc.start()
+    run_engine(config, algo_class(), trace)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    journey_times = total_passengers.journey_times()
+    in_elevator_times = total_passengers.in_elevator_times()
+
+    measured = {
+        'n_floors': config['n_floors'],
+        'n_passengers': len(trace),
+        'algo': algo_class.__name__,
+        'iterations': total_passengers.iterations,
+        'peak_memory': peak_memory,
+        'mean_journey_time': float(np.mean(journey_times)),
+    }
+    return measured, lambda: run_engine(config, algo_class(), trace), \
+        lambda: write_results(journey_times, in_elevator_times)
+
+
+def sample_time(func):
+    # Mean time of one call to func and what it returned, calling it until SAMPLE_TIME has passed so workloads of a
+    # few milliseconds are averaged over many calls rather than timed once
+    total, count, result = 0.0, 0, None
+    while count == 0 or total < SAMPLE_TIME:
+        ts = time.perf_counter()
+        result = func()
+        total, count = total + time.perf_counter() - ts, count + 1
+    return total / count, result
+
+
+def median_time(func, repeats):
+    # Median of repeats samples of the time of one call to func, and what it returned
+    samples = [sample_time(func) for _ in range(repeats)]
+    return float(np.median([elapsed for elapsed, _ in samples])), samples[-1][1]
+
+
+def write_results(journey_times, in_elevator_times):
+    # Streams RESULT_ITERATIONS simulations worth of results through a ResultSink to disk
+    directory = tempfile.mkdtemp(prefix="elevator_bench_")
+    try:
+        sink = ResultSink(directory, ["bench"])
+        for i in range(RESULT_ITERATIONS):
+            sink.append("bench", i, journey_times, in_elevator_times)
+        sink.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+def run_meta(**extra):
+    # What a set of results was measured with and on, after the settings of the run given
+    return dict(extra, python=platform.python_version(), numpy=np.__version__, machine=platform.machine(),
+                created=time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+
+def run_bench(floors, passengers, algos, engine="tick", repeats=7):
+    # Each pass takes one sample of every workload, rather than all the samples of one workload at once, so a slow
+    # spell on the machine only lands on one sample of each and the median leaves it out
+    prepared = {name: prepare_workload(config, algo_class, seed)
+                for name, config, algo_class, seed in workloads(floors, passengers, algos, engine)}
+    run_times = {name: [] for name in prepared}
+    write_times = {name: [] for name in prepared}
+    for _ in range(repeats):
+        for name, (_, simulate, write) in prepared.items():
+            run_times[name].append(sample_time(simulate)[0])
+            write_times[name].append(sample_time(write)[0])
+
+    results = {}
+    for name, (measured, _, _) in prepared.items():
+        run_time = float(np.median(run_times[name]))
+        results[name] = dict(measured, run_time=run_time,
+                             passengers_per_second=measured['n_passengers'] / run_time,
+                             ticks_per_second=measured['iterations'] / run_time,
+                             write_time=float(np.median(write_times[name])))
+        print(f"{name}: {results[name]['passengers_per_second']:.0f} passengers/s, "
+              f"{results[name]['ticks_per_second']:.0f} ticks/s, "
+              f"{results[name]['peak_memory'] / 1e6:.2f} MB peak, "
+              f"{results[name]['write_time'] * 1000:.1f} ms write", file=sys.stderr)
+
+    return {
+        'meta': run_meta(engine=engine, repeats=repeats, seed=SEED),
+        'workloads': results,
+    }
+
+
+def queue_trace(n_passengers, floors, rng):
+    # n_passengers all arriving at once on the middle floor, some going up and some down
+    origin = np.full(n_passengers, floors // 2, dtype=np.int64)
+    destination = rng.integers(floors - 1, size=n_passengers)
+    destination += destination >= origin
+    return Trace(np.zeros(n_passengers, dtype=np.int64), origin, destination, np.zeros(n_passengers))
+
+
+def run_queue_bench(lengths, algos, repeats=7):
+    # Time per tick of one lift working through a queue of each length on one floor. Letting passengers on and off
+    # only touches the ones that move, so the time per tick should stay flat however long the queue is
+    results = {}
+    growth = {}
+    for algo_class in algos:
+        tick_times = []
+        for n_passengers in lengths:
+            config = dict(BASE_CONFIG, n_floors=QUEUE_FLOORS, n_passengers=n_passengers, engine="tick")
+            trace = queue_trace(n_passengers, QUEUE_FLOORS, np.random.default_rng(SEED))
+            run_time, total_passengers = median_time(lambda: run_engine(config, algo_class(), trace), repeats)
+            tick_time = run_time / total_passengers.iterations
+            tick_times.append(tick_time)
+            results[f"{algo_class.__name__}_queue{n_passengers}"] = {
+                'queue_length': n_passengers,
+                'algo': algo_class.__name__,
+                'iterations': total_passengers.iterations,
+                'run_time': run_time,
+                'tick_time': tick_time,
+                'mean_journey_time': float(np.mean(total_passengers.journey_times())),
+            }
+        growth[algo_class.__name__] = tick_times[-1] / tick_times[0]
+        print(f"{algo_class.__name__}: " + ", ".join(f"{n} waiting {t * 1e6:.1f} us/tick"
+                                                    for n, t in zip(lengths, tick_times)), file=sys.stderr)
+
+    return {
+        'meta': run_meta(queue_lengths=lengths, floors=QUEUE_FLOORS, repeats=repeats, seed=SEED),
+        'growth': growth,  # Time per tick with the longest queue over that with the shortest, for each algorithm
+        'workloads': results,
+    }
+
+
+def import_time(module, repeats):
+    # Best time over the repeats to import module in a fresh interpreter once NumPy is loaded, NumPy's own import
+    # time and which heavy modules came with it
+    script = (f"import json, sys, time\n"
+              f"ts = time.perf_counter()\n"
+              f"import numpy\n"
+              f"numpy_time = time.perf_counter() - ts\n"
+              f"ts = time.perf_counter()\n"
+              f"import {module}\n"
+              f"print(json.dumps([numpy_time, time.perf_counter() - ts, "
+              f"[name for name in {HEAVY_MODULES!r} if name in sys.modules]]))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # So the elevator package and main are found
+    best = None
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, check=True)
+        numpy_time, module_time, heavy = json.loads(output.stdout)
+        if best is None or module_time < best['import_time']:
+            best = {'import_time': module_time, 'numpy_time': numpy_time, 'heavy_modules': heavy}
+    return best
+
+
+def run_import_bench(modules, repeats=5):
+    results = {}
+    for module in modules:
+        results[module] = import_time(module, repeats)
+        print(f"{module}: {results[module]['import_time'] * 1000:.1f} ms on top of NumPy "
+              f"({results[module]['numpy_time'] * 1000:.1f} ms)"
+              + (f", loaded {', '.join(results[module]['heavy_modules'])}" if results[module]['heavy_modules']
+                 else ""), file=sys.stderr)
+
+    return {
+        'meta': run_meta(budget=IMPORT_BUDGET, repeats=repeats),
+        'imports': results,
+    }
+
+
+def import_regressions(results):
+    regressions = []
+    for module, result in results['imports'].items():
+        if result['import_time'] > IMPORT_BUDGET:
+            regressions.append(f"{module}: took {result['import_time']:.3f}s to import, over the budget of "
+                               f"{IMPORT_BUDGET}s")
+        if result['heavy_modules']:
+            regressions.append(f"{module}: loaded {', '.join(result['heavy_modules'])} on import")
+    return regressions
+
+
+def compare(results, baseline, tolerance):
+    # Workloads that got slower (or used more memory) than the baseline by more than tolerance, and by more than the
+    # noise of a quiet machine. Mean journey times must match exactly - the workloads are seeded so a change means the
+    # simulation itself behaves differently
+    regressions = []
+    for name, current in results['workloads'].items():
+        if name not in baseline['workloads']:
+            continue
+        previous = baseline['workloads'][name]
+
+        for metric in ['run_time', 'write_time']:
+            if current[metric] > previous[metric] * (1 + tolerance) and \
+                    current[metric] - previous[metric] > MIN_TIME_DIFFERENCE:
+                regressions.append(f"{name}: {metric} rose from {previous[metric]:.4f} to {current[metric]:.4f}")
+        if current['peak_memory'] > previous['peak_memory'] * (1 + tolerance) and \
+                current['peak_memory'] - previous['peak_memory'] > MIN_MEMORY_DIFFERENCE:
+            regressions.append(f"{name}: peak_memory rose from {previous['peak_memory']} to {current['peak_memory']}")
+        if current['mean_journey_time'] != previous['mean_journey_time']:
+            regressions.append(f"{name}: mean_journey_time changed from {previous['mean_journey_time']} to "
+                               f"{current['mean_journey_time']}")
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m elevator.bench",
+                                     description="Benchmark the simulator on fixed-seed workloads")
+    parser.add_argument("--output", default="output/bench.json", help="where to write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also save the results as a baseline here")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="fraction a workload may be slower than the baseline before it counts as a regression")
+    parser.add_argument("--engine", default="tick", choices=["tick", "compiled", "event"])
+    parser.add_argument("--repeats", type=int, default=7,
+                        help="timing samples of each workload, the median is kept")
+    parser.add_argument("--quick", action="store_true", help=f"only {QUICK_FLOORS} floors and {QUICK_PASSENGERS} "
+                                                             f"passengers")
+    parser.add_argument("--floors", type=int, nargs="+", help=f"building sizes to run (default {FLOORS})")
+    parser.add_argument("--passengers", type=int, nargs="+", help=f"passenger counts to run (default {PASSENGERS})")
+    parser.add_argument("--algos", nargs="+", choices=[a.__name__ for a in ALGORITHMS],
+                        help="algorithms to run (default all)")
+    parser.add_argument("--queue", type=int, nargs="*", metavar="LENGTH",
+                        help=f"instead time each tick as the queue on a floor grows (default {QUEUE_LENGTHS}), "
+                             f"failing if it grows more than {MAX_QUEUE_GROWTH} times")
+    parser.add_argument("--imports", action="store_true",
+                        help=f"instead time importing the simulation core, failing if a module takes over "
+                             f"{IMPORT_BUDGET}s on top of NumPy or loads any of {HEAVY_MODULES}")
+    args = parser.parse_args(argv)
+
+    floors = args.floors or (QUICK_FLOORS if args.quick else FLOORS)
+    passengers = args.passengers or (QUICK_PASSENGERS if args.quick else PASSENGERS)
+    algos = [a for a in ALGORITHMS if not args.algos or a.__name__ in args.algos]
+
+    if args.imports:
+        results = run_import_bench(CORE_MODULES, max(args.repeats, 5))
+    elif args.queue is not None:
+        results = run_queue_bench(args.queue or QUEUE_LENGTHS, algos, args.repeats)
+    else:
+        results = run_bench(floors, passengers, algos, args.engine, args.repeats)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.imports:
+        regressions = import_regressions(results)
+    elif args.queue is not None:
+        regressions = [f"{name}: time per tick grew {ratio:.2f} times from the shortest queue to the longest"
+                       for name, ratio in results['growth'].items() if ratio > MAX_QUEUE_GROWTH]
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if not regressions:
+            print(f"No regressions against {args.baseline}", file=sys.stderr)
+    else:
+        return 0
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
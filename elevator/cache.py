@@ -0,0 +1,124 @@
+import hashlib
+import inspect
+import json
+import numpy as np
+import os
+
+from functools import lru_cache
+
+# Bump whenever a change to the engines changes the results of a simulation, so results cached before it are not used
+SIMULATION_VERSION = 7
+
+# Config keys that don't change the results of a simulation, so are left out of the cache key
+IGNORED_KEYS = {'algos', 'iterations', 'seed', 'draw', 'workers', 'batch_size', 'record_trace', 'chunk_size',
+                'keep_results', 'instrument', 'cache', 'cache_size'}
+
+
+class ResultCache:
+    def __init__(self, directory, max_bytes=2 ** 30):
+        # Journey and in lift times of single simulations saved under a hash of everything that decides them, so a
+        # re-run only simulates what is missing. Least recently used results are removed past max_bytes
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, config, algo_class, seed):
+        key = {
+            'config': normalise_config(config),
+            'algo': algo_class.__name__,
+            'algo_source': source_hash(algo_class),
+            'seed': int(seed),
+            'version': SIMULATION_VERSION,
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.npy")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            times = np.load(path)
+            os.utime(path)  # Marks it as recently used
+        except (FileNotFoundError, ValueError, OSError):  # Missing, or removed or half written by another process
+            return None
+        return times[0], times[1]
+
+    def put(self, key, journey_times, in_elevator_times):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            np.save(f, np.stack([journey_times, in_elevator_times]))
+        os.replace(temporary, path)  # Workers may write the same result at once, so it only appears once complete
+
+    def evict(self):
+        # Removes the least recently used results until the cache fits in max_bytes, returns how many were removed
+        files = []
+        for directory, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".npy"):
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def result_cache(config):
+    # The cache the config asks for, or None if it doesn't use one
+    if not config.get('cache'):
+        return None
+    return ResultCache(config['cache'], config.get('cache_size', 2 ** 30))
+
+
+def normalise_config(config):
+    normalised = {}
+    for key, value in config.items():
+        if key in IGNORED_KEYS or value is None:
+            continue
+        if isinstance(value, type):  # e.g. the dispatcher
+            value = value.__name__
+        elif hasattr(value, 'to_dict'):  # e.g. a traffic profile
+            value = value.to_dict()
+        elif isinstance(value, (tuple, np.ndarray)):
+            value = list(value)
+        normalised[key] = value
+
+    # The tick, compiled and batched engines give the same results so can share them, the event engine can't
+    normalised['engine'] = 'event' if config.get('engine') == 'event' else 'tick'
+
+    if isinstance(config.get('trace'), str):  # A replayed trace is keyed by what is in it rather than where it is
+        stat = os.stat(config['trace'])
+        normalised['trace'] = file_hash(os.path.abspath(config['trace']), stat.st_mtime, stat.st_size)
+
+    return normalised
+
+
+@lru_cache(maxsize=None)
+def source_hash(algo_class):
+    try:
+        source = inspect.getsource(algo_class)
+    except (OSError, TypeError):  # Defined somewhere without source, e.g. the interpreter
+        return None
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+@lru_cache(maxsize=16)
+def file_hash(path, mtime, size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2 ** 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import numpy as np
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+CHART_VERSION = 1  # Bump when the look of the charts changes so every cached figure is drawn again
+MAX_BINS = 200  # Most bins in a histogram, and the bins the violin plot densities are worked out from
+KDE_POINTS = 100  # Points each violin plot density is evaluated at
+
+
+def render_charts(directory, df_journey_times, df_in_elevator_times, pool=None, workers=1):
+    # Draws the box, violin and histogram charts of a test into directory. The data are cut down to quantiles and
+    # binned counts first, so only a few numbers per figure are hashed, sent to a worker and drawn. Figures whose
+    # data match the cache manifest from the last time are skipped. Returns the files that were drawn
+    figures = chart_figures(df_journey_times, df_in_elevator_times)
+
+    manifest_path = os.path.join(directory, "charts.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    hashes = {file: figure_hash(plot, data) for file, (plot, data) in figures.items()}
+    to_draw = [file for file in figures
+               if manifest.get(file) != hashes[file] or not os.path.exists(os.path.join(directory, file))]
+
+    if pool is None and workers > 1 and len(to_draw) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as chart_pool:
+            draw_figures(chart_pool, directory, figures, to_draw)
+    else:
+        draw_figures(pool, directory, figures, to_draw)
+
+    with open(manifest_path, 'w') as f:
+        json.dump(hashes, f, indent=2)
+
+    return to_draw
+
+
+def draw_figures(pool, directory, figures, files):
+    if pool is None:
+        for file in files:
+            render(os.path.join(directory, file), *figures[file])
+        return
+
+    futures = [pool.submit(render, os.path.join(directory, file), *figures[file]) for file in files]
+    for future in futures:
+        future.result()
+
+
+def chart_figures(df_journey_times, df_in_elevator_times):
+    # Data of every figure keyed by its file name, with the 95 datasets leaving out the longest 5% of each algorithm
+    datasets = {}
+    for df_name, df_name_95, df in [('journey', 'journey_95', df_journey_times),
+                                    ('elevator', 'elevator95', df_in_elevator_times)]:
+        columns = {algo: np.sort(df[algo].to_numpy(dtype=float)) for algo in df.columns}  # NaNs are sorted last
+        cut = round(len(df) * 0.95)
+        datasets[df_name] = {algo: values[~np.isnan(values)] for algo, values in columns.items()}
+        datasets[df_name_95] = {algo: values[:cut][~np.isnan(values[:cut])] for algo, values in columns.items()}
+
+    figures = {}
+    for df_name, columns in datasets.items():
+        algos = [algo for algo, values in columns.items() if len(values)]
+        figures[f"boxplot_{df_name}.png"] = ('boxplot', {'boxes': [box_stats(algo, columns[algo]) for algo in algos]})
+        figures[f"violinplot_{df_name}.png"] = ('violinplot', {'labels': algos,
+                                                                'violins': [violin_stats(columns[algo])
+                                                                            for algo in algos]})
+        for algo, values in columns.items():
+            figures[f"{df_name}_{algo}_{df_name}.png"] = ('histogram', dict(histogram(values), label=algo))
+    return figures
+
+
+def figure_hash(plot, data):
+    key = json.dumps({'version': CHART_VERSION, 'plot': plot, 'data': data}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def box_stats(label, values):
+    # Quartiles, whiskers at the furthest values within 1.5 IQR and the outliers beyond them (to 0.1 s), as
+    # Axes.bxp takes them
+    q1, median, q3 = (float(q) for q in np.percentile(values, [25, 50, 75]))
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    outside = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+    return {'label': label, 'q1': q1, 'med': median, 'q3': q3, 'whislo': float(inside.min()),
+            'whishi': float(inside.max()), 'fliers': np.unique(np.round(outside, 1)).tolist()}
+
+
+def histogram(values, bins='auto'):
+    if not len(values):
+        return {'edges': [0.0, 1.0], 'counts': [0]}
+    edges = np.histogram_bin_edges(values, bins)
+    if len(edges) > MAX_BINS + 1:
+        edges = np.histogram_bin_edges(values, MAX_BINS)
+    counts, edges = np.histogram(values, edges)
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def violin_stats(values):
+    # Gaussian kernel density (Scott's bandwidth) worked out from binned counts rather than every value, as
+    # Axes.violin takes it
+    counts, edges = np.histogram(values, MAX_BINS)
+    centres = (edges[:-1] + edges[1:]) / 2
+    coords = np.linspace(values.min(), values.max(), KDE_POINTS)
+
+    bandwidth = np.std(values) * len(values) ** (-1 / 5)
+    if bandwidth > 0:
+        kernel = np.exp(-0.5 * ((coords[:, None] - centres[None, :]) / bandwidth) ** 2)
+        density = kernel @ counts / (len(values) * bandwidth * np.sqrt(2 * np.pi))
+    else:  # Every value is the same
+        density = np.ones(KDE_POINTS)
+
+    return {'coords': coords.tolist(), 'vals': density.tolist(), 'mean': float(np.mean(values)),
+            'median': float(np.median(values)), 'min': float(values.min()), 'max': float(values.max())}
+
+
+def render(path, plot, data):
+    # Draws one figure straight onto an Agg canvas - no pyplot, so nothing depends on the interactive backend and
+    # figures can be drawn in worker processes
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+
+    if plot == 'boxplot':
+        ax.bxp(data['boxes'])
+    elif plot == 'violinplot':
+        if data['violins']:
+            positions = range(len(data['violins']))
+            ax.violin(data['violins'], positions=positions, showmedians=True)
+            ax.set_xticks(positions)
+            ax.set_xticklabels(data['labels'])
+    elif plot == 'histogram':
+        ax.stairs(data['counts'], data['edges'], fill=True)
+        ax.set_xlabel(data['label'])
+        ax.set_ylabel("Count")
+
+    figure.savefig(path)
@@ -1,5 +1,10 @@
+import heapq
+import itertools
 import numpy as np
 
+from collections import deque
+from functools import lru_cache
+
 
 class Elevator:
     def __init__(self, max_occupancy=10, directional_passengers=False, acceleration=1.5, speed=6.7,
@@ -15,7 +20,8 @@ class Elevator:
         self.acceleration = acceleration  # Acceleration/deceleration of the lift
         self.speed = speed  # Speed of the lift
         self.embark_disembark_time = embark_disembark_time
-        self.occupants = []  # List of passengers (Passenger class) currently in the lift
+        self.occupants = PassengerSet()  # Passengers (Passenger class) currently in the lift, in the order they got on
+        self.by_destination = {}  # The same passengers in lists by destination floor, so getting off is one lookup
         self.direction = 0  # Direction the lift last travelled (+1 up, -1 down)
         self.journey = [0]  # History of floors it has visited and stopped at
         self.stops = 0  # Number of stops made
@@ -27,12 +33,12 @@ class Elevator:
             return "Max occupancy reached"
 
         self.occupants.append(passenger)
+        self.by_destination.setdefault(passenger.destination, []).append(passenger)
 
     def exit_passengers(self):
-        exit_passengers = []
-        for i, passenger in enumerate(self.occupants):
-            if passenger.destination == self.position:
-                exit_passengers.append(self.occupants.pop(i))
+        exit_passengers = self.by_destination.pop(self.position, [])
+        for passenger in exit_passengers:
+            self.occupants.remove(passenger)
         self.dropped_off_passengers = len(exit_passengers)
         return exit_passengers
 
@@ -40,20 +46,277 @@ class Elevator:
         self.previous_floor = self.position
         self.previous_stop_timestep = self.floors_travelled
         self.stops += 1
-        self.direction = np.sign(destination - self.position)
+        if destination != self.position:  # Staying put keeps the direction, so turning the lift round sticks
+            self.direction = np.sign(destination - self.position)
         self.floors_travelled += abs(destination - self.position)
         self.position = destination
         self.journey.append(self.position)
 
+    def travel_costs(self, building):
+        # Seconds it would take to travel from the current floor to every floor of the building
+        return building.travel_time_table(self.acceleration, self.speed)[self.position]
+
+
+class Car:
+    def __init__(self, elevator, building, algo):
+        # One lift in a group. Each car has its own Building so its algorithm only sees the calls dispatched to it
+        self.elevator = elevator
+        self.building = building
+        self.algo = algo
+        self.origins = {i: FloorQueue() for i in range(building.floors)}  # Passengers waiting for this car on each floor
+        self.destinations = {i: PassengerSet() for i in range(building.floors)}  # Passengers this car has to drop off on each floor
+
+
+class FloorQueue:
+    def __init__(self):
+        # Passengers waiting on a floor in the order they arrived, kept in one queue for each direction so the lift
+        # can take everyone going its way without stepping over the people going the other way
+        self.up = deque()  # (arrival number, passenger)
+        self.down = deque()
+        self.arrivals = 0
+
+    def append(self, passenger):
+        (self.up if passenger.direction == 1 else self.down).append((self.arrivals, passenger))
+        self.arrivals += 1
+
+    def take(self, n, direction=None):
+        # Removes and returns up to n of the passengers going in the direction, or either if it is None, in the
+        # order they arrived
+        taken = []
+        while len(taken) < n:
+            if direction == 1 or (direction is None and (not self.down or
+                                                          (self.up and self.up[0][0] < self.down[0][0]))):
+                queue = self.up
+            elif direction == -1 or direction is None:
+                queue = self.down
+            else:  # A lift that hasn't moved yet has no direction
+                break
+            if not queue:
+                break
+            taken.append(queue.popleft()[1])
+        return taken
+
+    def __len__(self):
+        return len(self.up) + len(self.down)
+
+    def __iter__(self):
+        return (passenger for _, passenger in heapq.merge(self.up, self.down))
+
+    def __getitem__(self, index):
+        # Cheap for the first few, e.g. queue[0] for whoever has waited longest
+        return nth(self, index)
+
+    def __eq__(self, other):
+        return same_passengers(self, other)
+
+
+class PassengerSet:
+    def __init__(self):
+        # Passengers in the order they were added, any of whom can be removed in constant time
+        self.passengers = {}
+
+    def append(self, passenger):
+        self.passengers[passenger] = None
+
+    def remove(self, passenger):
+        del self.passengers[passenger]
+
+    def __len__(self):
+        return len(self.passengers)
+
+    def __iter__(self):
+        return iter(self.passengers)
+
+    def __contains__(self, passenger):
+        return passenger in self.passengers
+
+    def __getitem__(self, index):
+        return nth(self, index)
+
+    def __eq__(self, other):
+        return same_passengers(self, other)
+
+
+def nth(passengers, index):
+    if index < 0:
+        index += len(passengers)
+    if not 0 <= index < len(passengers):
+        raise IndexError("passenger index out of range")
+    return next(itertools.islice(passengers, index, None))
+
+
+def same_passengers(passengers, other):
+    # Compares equal to a list of the same passengers in the same order, so algorithms can check for an empty floor
+    # with passengers != [] as they could when these were lists
+    if not isinstance(other, (list, FloorQueue, PassengerSet)):
+        return NotImplemented
+    return len(passengers) == len(other) and all(a is b for a, b in zip(passengers, other))
+
 
 class Building:
     def __init__(self, floors, storey_height=4):
         # These can all be used by the algorithm to determine the next floor
+        if not np.isscalar(storey_height) and len(storey_height) < floors - 1:
+            raise Exception(f"A building with {floors} floors needs the heights of at least {floors - 1} storeys, "
+                            f"got {len(storey_height)}")
+        self.floors = floors
+        self.storey_height = storey_height  # Height of every storey, or a list of the height of each storey from the ground up
+        self.state = FloorState(floors)  # Who is waiting where and where they are going, kept up to date each move
+
+    def travel_time_table(self, acceleration, max_speed):
+        # Seconds to travel between every pair of floors, indexed [from floor, to floor]
+        storey_height = self.storey_height
+        if not np.isscalar(storey_height):
+            storey_height = tuple(storey_height)
+        return travel_time_table(self.floors, storey_height, acceleration, max_speed)
+
+
+@lru_cache(maxsize=64)
+def travel_time_table(floors, storey_height, acceleration, max_speed):
+    # Built once per building and lift, then shared by every lift and simulation that uses it
+    if isinstance(storey_height, tuple):  # Non-uniform storeys, e.g. a taller lobby
+        elevations = np.concatenate([[0], np.cumsum(storey_height[:floors - 1])])
+        distance = np.abs(np.subtract.outer(elevations, elevations))
+    else:
+        distance = storey_height * np.abs(np.subtract.outer(np.arange(floors), np.arange(floors)))
+
+    acceleration_distance = (max_speed ** 2) / (2 * acceleration)
+
+    # Lifts that never reach max speed accelerate for half the journey and decelerate for the other half
+    short_travel_time = 2 * np.sqrt((2 * distance) / acceleration)
+
+    acceleration_time = (1 / 2) * (acceleration_distance) / max_speed
+    max_speed_time = (distance - acceleration_distance) / max_speed
+    long_travel_time = 2 * acceleration_time + max_speed_time
+
+    table = np.where(acceleration_distance > distance, short_travel_time, long_travel_time)
+    table.flags.writeable = False  # Shared between buildings so must not be changed
+    return table
+
+
+class FloorState:
+    def __init__(self, floors):
+        # Updated as passengers arrive, board and get off so algorithms can look up the state of a floor without
+        # rescanning the origins and destinations dictionaries
         self.floors = floors
-        self.storey_height = storey_height
+        self.waiting_up = np.zeros(floors, dtype=np.int64)  # Number of passengers on each floor waiting to go up
+        self.waiting_down = np.zeros(floors, dtype=np.int64)  # Number of passengers on each floor waiting to go down
+        self.waiting_destinations = np.zeros(floors, dtype=np.int64)  # Number of waiting passengers going to each floor
+        self.waiting_routes = np.zeros((floors, floors), dtype=np.int64)  # Waiting passengers by [origin, destination]
+        self.destinations = np.zeros(floors, dtype=np.int64)  # Passengers yet to be dropped off at each floor
+        self.riding = np.zeros(floors, dtype=np.int64)  # Passengers in the lift going to each floor
+        self.oldest_waiting = np.full(floors, np.inf)  # journey_start of the passenger who has waited longest on each floor
+        self.calls = set()  # Floors where someone is waiting
+        self.outstanding = 0  # Passengers that have not reached their destination yet
+
+    def arrive(self, passenger):
+        if passenger.origin not in self.calls:  # Passengers arrive in order so the first one on a floor has waited longest
+            self.calls.add(passenger.origin)
+            self.oldest_waiting[passenger.origin] = passenger.journey_start
+        if passenger.direction == 1:
+            self.waiting_up[passenger.origin] += 1
+        else:
+            self.waiting_down[passenger.origin] += 1
+        self.waiting_destinations[passenger.destination] += 1
+        self.waiting_routes[passenger.origin, passenger.destination] += 1
+        self.destinations[passenger.destination] += 1
+        self.outstanding += 1
+
+    def board(self, passenger):
+        if passenger.direction == 1:
+            self.waiting_up[passenger.origin] -= 1
+        else:
+            self.waiting_down[passenger.origin] -= 1
+        self.waiting_destinations[passenger.destination] -= 1
+        self.waiting_routes[passenger.origin, passenger.destination] -= 1
+        self.riding[passenger.destination] += 1
+
+    def alight(self, passenger):
+        self.destinations[passenger.destination] -= 1
+        self.riding[passenger.destination] -= 1
+        self.outstanding -= 1
+
+    def update_floor(self, floor, waiting_passengers):
+        # Called after boarding with the passengers still waiting on the floor, in the order they arrived
+        if waiting_passengers:
+            self.oldest_waiting[floor] = waiting_passengers[0].journey_start
+        else:
+            self.calls.discard(floor)
+            self.oldest_waiting[floor] = np.inf
+
+    def pending(self):
+        # Whether anyone is waiting for or riding in the lift
+        return self.outstanding > 0
+
+    def waiting(self, floor):
+        return self.waiting_up[floor] + self.waiting_down[floor]
+
+    def longest_waiting_floor(self):
+        # Floor of the passenger who has waited longest, the lowest floor if there is a tie
+        if not self.calls:
+            return None
+        return int(np.argmin(self.oldest_waiting))
+
+
+class DecisionView:
+    def __init__(self, building, elevator, origins, destinations):
+        # Everything an algorithm using the array interface gets to decide the next floor, mostly numpy arrays
+        # indexed by floor that are shared with building.state rather than copied
+        state = building.state
+        self.floors = building.floors
+        self.position = elevator.position  # Current floor of the lift
+        self.direction = elevator.direction  # Direction the lift last travelled (+1 up, -1 down, 0 not moved)
+        self.n_occupants = len(elevator.occupants)
+        self.max_occupancy = elevator.max_occupancy
+        self.pending = state.pending()  # Whether anyone is waiting for or riding in the lift
+        self.waiting_up = state.waiting_up  # Passengers waiting to go up on each floor
+        self.waiting_down = state.waiting_down  # Passengers waiting to go down on each floor
+        self.waiting_destinations = state.waiting_destinations  # Waiting passengers going to each floor
+        self.waiting_routes = state.waiting_routes  # Waiting passengers by [origin, destination]
+        self.oldest_waiting = state.oldest_waiting  # journey_start of the longest waiting passenger on each floor
+        self.occupant_destinations = state.riding  # Passengers in the lift going to each floor
+
+        # The objects themselves, for anything the arrays don't cover
+        self.building = building
+        self.elevator = elevator
+        self.origins = origins
+        self.destinations = destinations
+
+    @property
+    def full(self):
+        return self.n_occupants == self.max_occupancy
+
+    @property
+    def calls(self):
+        # Whether anyone is waiting on each floor
+        return (self.waiting_up + self.waiting_down) > 0
+
+    @property
+    def travel_costs(self):
+        # Seconds to travel from the current floor to every floor
+        return self.elevator.travel_costs(self.building)
+
+    def closest_drop_off(self):
+        # Closest destination of the passengers in the lift, that of whoever got on first if two are as close
+        current_closest = 1e10
+        for passenger in self.elevator.occupants:
+            if abs(self.position - passenger.destination) < abs(self.position - current_closest):
+                current_closest = passenger.destination
+        return current_closest
+
+    def oldest_occupant(self):
+        # journey_start and destination of the passenger in the lift who has been travelling longest
+        earliest_journey_start, destination = 1e10, None
+        for passenger in self.elevator.occupants:
+            if passenger.journey_start < earliest_journey_start:
+                earliest_journey_start, destination = passenger.journey_start, passenger.destination
+        return earliest_journey_start, destination
 
 
 class Passenger:
+    __slots__ = ('origin', 'destination', 'direction', 'journey_start', 'journey_end', 'journey_time', 'get_on',
+                 'get_off', 'time_in_elevator')
+
     def __init__(self, origin, destination, journey_start):
         # These can all be used by the algorithm to determine the next floor
         self.origin = origin  # Floor they start on
@@ -70,3 +333,80 @@ class Passenger:
         self.journey_end = journey_end
         self.journey_time = self.journey_end - self.journey_start
         self.time_in_elevator = self.get_off - self.get_on
+
+
+class PassengerStore:
+    def __init__(self, capacity):
+        # Every passenger of a simulation stored as columns of numpy arrays rather than one Python object each
+        self.size = 0
+        self.iterations = 0  # Iterations (or events for the event engine) the simulation took
+        self.origin = np.zeros(capacity, dtype=np.int32)
+        self.destination = np.zeros(capacity, dtype=np.int32)
+        self.direction = np.zeros(capacity, dtype=np.int8)
+        self.journey_start = np.full(capacity, np.nan)
+        self.get_on = np.full(capacity, np.nan)
+        self.get_off = np.full(capacity, np.nan)
+        self.journey_end = np.full(capacity, np.nan)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, origin, destination, journey_start):
+        index = self.size
+        self.size += 1
+        self.origin[index] = origin
+        self.destination[index] = destination
+        self.journey_start[index] = journey_start
+        passenger = StoredPassenger(self, index, origin, destination, journey_start)
+        self.direction[index] = passenger.direction
+        return passenger
+
+    def journey_times(self):
+        return self.journey_end[:self.size] - self.journey_start[:self.size]
+
+    def in_elevator_times(self):
+        return self.get_off[:self.size] - self.get_on[:self.size]
+
+
+class StoredPassenger:
+    # Lightweight view of one passenger in a PassengerStore, used in place of Passenger while they are in the building
+    __slots__ = ('store', 'index', 'origin', 'destination', 'direction', 'journey_start')
+
+    def __init__(self, store, index, origin, destination, journey_start):
+        self.store = store
+        self.index = index
+        self.origin = origin
+        self.destination = destination
+        self.direction = 1 if origin < destination else -1
+        self.journey_start = journey_start
+
+    @property
+    def get_on(self):
+        return self.store.get_on[self.index]
+
+    @get_on.setter
+    def get_on(self, value):
+        self.store.get_on[self.index] = value
+
+    @property
+    def get_off(self):
+        return self.store.get_off[self.index]
+
+    @get_off.setter
+    def get_off(self, value):
+        self.store.get_off[self.index] = value
+
+    @property
+    def journey_end(self):
+        return self.store.journey_end[self.index]
+
+    @property
+    def journey_time(self):
+        return self.journey_end - self.journey_start
+
+    @property
+    def time_in_elevator(self):
+        return self.get_off - self.get_on
+
+    def complete_journey(self, journey_end):
+        self.store.journey_end[self.index] = journey_end
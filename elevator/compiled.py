@@ -0,0 +1,310 @@
+import numpy as np
+
+from elevator.algorithms import SimpleUpDown, ClosestFloor, NormalLift, LongestWaited, PopularFloor
+from elevator.classes import Building, PassengerStore
+from elevator.traces import single_lift_run
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional - without it run_simulation falls back to the tick engine
+    njit = None
+
+# Array version of each built-in algorithm that the compiled engine supports
+ALGORITHM_CODES = {SimpleUpDown: 0, ClosestFloor: 1, NormalLift: 2, LongestWaited: 3, PopularFloor: 4}
+
+
+def jit(func):
+    if njit is None:
+        return func
+    return njit(cache=True)(func)
+
+
+def available():
+    return njit is not None
+
+
+def supports(config, algo):
+    return type(algo) in ALGORITHM_CODES and single_lift_run(config)
+
+
+def run_compiled(config, algo, trace):
+    # Same simulation as run_ticks, with the whole loop compiled by Numba over arrays of state
+    n_passengers = len(trace)
+    building = Building(config['n_floors'], config['storey_height'])
+    total_passengers = PassengerStore(n_passengers)
+
+    total_passengers.origin[:] = trace.origin
+    total_passengers.destination[:] = trace.destination
+    total_passengers.direction[:] = np.where(total_passengers.origin < total_passengers.destination, 1, -1)
+    total_passengers.size = n_passengers
+
+    total_passengers.iterations = simulate(np.ascontiguousarray(trace.step, dtype=np.int64),
+             np.ascontiguousarray(trace.origin, dtype=np.int64),
+             np.ascontiguousarray(trace.destination, dtype=np.int64),
+             building.floors, config['max_occupancy'], algo.only_pickup_directional_passengers,
+             float(config['embark_disembark_time']),
+             building.travel_time_table(config['acceleration'], config['max_speed']),
+             ALGORITHM_CODES[type(algo)],
+             total_passengers.journey_start, total_passengers.get_on, total_passengers.get_off)
+
+    total_passengers.journey_end[:] = total_passengers.get_off
+    return total_passengers
+
+
+@jit
+def simulate(step, origin, destination, floors, max_occupancy, directional, embark_disembark_time, travel_times,
+             algorithm, journey_start, get_on, get_off):
+    n_passengers = len(origin)
+
+    # Queues of passengers waiting on each floor as linked lists in the order they arrived, one for going up
+    # (column 0) and one for going down (column 1) like FloorQueue
+    head = np.full((floors, 2), -1, dtype=np.int64)
+    tail = np.full((floors, 2), -1, dtype=np.int64)
+    next_in_queue = np.full(n_passengers, -1, dtype=np.int64)
+
+    # Same counts as FloorState
+    waiting_up = np.zeros(floors, dtype=np.int64)
+    waiting_down = np.zeros(floors, dtype=np.int64)
+    waiting_destinations = np.zeros(floors, dtype=np.int64)
+    waiting_routes = np.zeros((floors, floors), dtype=np.int64)
+    riding = np.zeros(floors, dtype=np.int64)
+    oldest_waiting = np.full(floors, np.inf)
+    outstanding = 0
+
+    occupants = np.zeros(max(max_occupancy, 1), dtype=np.int64)  # Passengers in the lift in the order they got on
+    n_occupants = 0
+
+    position = 0
+    direction = 0
+    time = 0.0
+
+    next_passenger = 0
+    iteration = 0
+
+    while outstanding > 0 or next_passenger < n_passengers:
+        while next_passenger < n_passengers and step[next_passenger] <= iteration:
+            p = next_passenger
+            journey_start[p] = time
+            queue = 0 if origin[p] < destination[p] else 1
+            if head[origin[p], 0] == -1 and head[origin[p], 1] == -1:
+                oldest_waiting[origin[p]] = time
+            if head[origin[p], queue] == -1:
+                head[origin[p], queue] = p
+            else:
+                next_in_queue[tail[origin[p], queue]] = p
+            tail[origin[p], queue] = p
+            if origin[p] < destination[p]:
+                waiting_up[origin[p]] += 1
+            else:
+                waiting_down[origin[p]] += 1
+            waiting_destinations[destination[p]] += 1
+            waiting_routes[origin[p], destination[p]] += 1
+            outstanding += 1
+            next_passenger += 1
+
+        # Passengers get off, keeping the rest in the order they got on
+        n_exit = 0
+        n_staying = 0
+        for i in range(n_occupants):
+            p = occupants[i]
+            if destination[p] == position:
+                riding[position] -= 1
+                outstanding -= 1
+                get_off[p] = time
+                n_exit += 1
+            else:
+                occupants[n_staying] = p
+                n_staying += 1
+        n_occupants = n_staying
+
+        # Passengers get on
+        n_waiting = waiting_up[position] + waiting_down[position]
+
+        take_all_passengers = False
+        if not (waiting_up[position] > 0 and waiting_down[position] > 0):
+            if n_occupants == 0:
+                take_all_passengers = True
+            else:
+                for i in range(n_occupants):
+                    if np.sign(destination[occupants[i]] - position) == -1 * direction:
+                        take_all_passengers = True
+                        break
+
+        # Only the queues the lift takes from are walked, so passengers going the other way are never stepped over
+        take_up = True
+        take_down = True
+        if directional and not (position == 0 or position == floors - 1 or take_all_passengers):
+            take_up = direction == 1
+            take_down = direction == -1
+
+        while n_occupants < max_occupancy:
+            up = head[position, 0] if take_up else -1
+            down = head[position, 1] if take_down else -1
+            if up == -1 and down == -1:
+                break
+            queue = 0 if down == -1 or (up != -1 and up < down) else 1  # Earlier arrivals have lower indices
+            p = head[position, queue]
+            head[position, queue] = next_in_queue[p]
+            if head[position, queue] == -1:
+                tail[position, queue] = -1
+            occupants[n_occupants] = p
+            n_occupants += 1
+            get_on[p] = time
+            if queue == 0:
+                waiting_up[position] -= 1
+            else:
+                waiting_down[position] -= 1
+            waiting_destinations[destination[p]] -= 1
+            waiting_routes[position, destination[p]] -= 1
+            riding[destination[p]] += 1
+
+        if head[position, 0] == -1 and head[position, 1] == -1:
+            oldest_waiting[position] = np.inf
+        elif head[position, 1] == -1 or (head[position, 0] != -1 and head[position, 0] < head[position, 1]):
+            oldest_waiting[position] = journey_start[head[position, 0]]
+        else:
+            oldest_waiting[position] = journey_start[head[position, 1]]
+
+        # Pick the next floor and move there
+        if algorithm == 0:
+            next_floor = simple_up_down(floors, position, direction)
+        elif algorithm == 1:
+            next_floor = closest_floor(position, n_occupants, max_occupancy, outstanding, waiting_up, waiting_down,
+                                       occupants, destination)
+        elif algorithm == 2:
+            next_floor = normal_lift(floors, position, direction, n_occupants, max_occupancy, waiting_up,
+                                     waiting_down, riding)
+        elif algorithm == 3:
+            next_floor = longest_waited(position, n_occupants, max_occupancy, outstanding, oldest_waiting,
+                                        occupants, journey_start, destination)
+        else:
+            next_floor = popular_floor(floors, position, n_occupants, max_occupancy, outstanding,
+                                       waiting_destinations, waiting_routes, riding)
+
+        previous_floor = position
+        if next_floor == position:  # Turns round, like run_iteration
+            direction = -1 * direction
+        else:
+            direction = int(np.sign(next_floor - position))
+        position = next_floor
+
+        time += (n_waiting + n_exit) * embark_disembark_time + travel_times[previous_floor, position]
+        iteration += 1
+
+    return iteration
+
+
+@jit
+def nearest_floor(mask, position):
+    # Closest floor where mask is set, the lower one if two are as close, or -1 if there are none
+    best = -1
+    for floor in range(len(mask)):
+        if mask[floor] and (best == -1 or abs(floor - position) < abs(best - position)):
+            best = floor
+    return best
+
+
+@jit
+def simple_up_down(floors, position, direction):
+    if not direction and position == 0:
+        return 1
+    if position == 0 or position == floors - 1:
+        return position - direction
+    return position + direction
+
+
+@jit
+def closest_floor(position, n_occupants, max_occupancy, outstanding, waiting_up, waiting_down, occupants,
+                  destination):
+    if not n_occupants and not outstanding > 0:
+        return 0
+
+    current_closest = 10 ** 10
+    for i in range(n_occupants):  # Like DecisionView.closest_drop_off, whoever got on first wins a tie
+        if abs(position - destination[occupants[i]]) < abs(position - current_closest):
+            current_closest = destination[occupants[i]]
+
+    if n_occupants != max_occupancy:
+        closest_floor_waiting = nearest_floor((waiting_up + waiting_down) > 0, position)
+        if closest_floor_waiting != -1 and abs(position - closest_floor_waiting) < abs(position - current_closest):
+            current_closest = closest_floor_waiting
+
+    return current_closest
+
+
+@jit
+def normal_lift(floors, position, direction, n_occupants, max_occupancy, waiting_up, waiting_down, riding):
+    if n_occupants == max_occupancy:
+        potential_stops = riding > 0
+    else:
+        potential_stops = ((waiting_up + waiting_down) > 0) | (riding > 0)
+
+    current_direction = direction if direction else 1
+
+    lowest_floor_above = position
+    for floor in range(position + 1, floors):
+        if potential_stops[floor]:
+            lowest_floor_above = floor
+            break
+
+    highest_floor_below = position
+    for floor in range(position - 1, -1, -1):
+        if potential_stops[floor]:
+            highest_floor_below = floor
+            break
+
+    if current_direction == 1:
+        return lowest_floor_above if lowest_floor_above != position else highest_floor_below
+    return highest_floor_below if highest_floor_below != position else lowest_floor_above
+
+
+@jit
+def longest_waited(position, n_occupants, max_occupancy, outstanding, oldest_waiting, occupants, journey_start,
+                   destination):
+    earliest_journey_start = 1e10
+    longest_waited_floor = -1
+    earliest = np.min(oldest_waiting)
+    if earliest != np.inf:
+        longest_waited_floor = np.argmin(oldest_waiting)
+        earliest_journey_start = earliest
+
+    elevator_earliest_journey_start = 1e10
+    elevator_longest_waited_floor = -1
+    for i in range(n_occupants):
+        if journey_start[occupants[i]] < elevator_earliest_journey_start:
+            elevator_earliest_journey_start = journey_start[occupants[i]]
+            elevator_longest_waited_floor = destination[occupants[i]]
+
+    if max_occupancy == n_occupants:
+        return elevator_longest_waited_floor
+
+    if not n_occupants and not outstanding > 0:
+        return 0
+
+    if not n_occupants:
+        return longest_waited_floor
+    if elevator_earliest_journey_start <= earliest_journey_start:
+        return elevator_longest_waited_floor
+    return longest_waited_floor
+
+
+@jit
+def popular_floor(floors, position, n_occupants, max_occupancy, outstanding, waiting_destinations, waiting_routes,
+                  riding):
+    if not n_occupants and not outstanding > 0:
+        return int(round(floors / 2))
+
+    if not n_occupants:
+        most_popular_destination_passengers = np.argmax(waiting_destinations)
+        return np.argmax(waiting_routes[:, most_popular_destination_passengers])
+
+    most_popular_destination_occupants = np.argmax(riding)
+
+    if max_occupancy == n_occupants:
+        return most_popular_destination_occupants
+
+    for floor in range(position, most_popular_destination_occupants):
+        if waiting_routes[floor, most_popular_destination_occupants]:
+            return floor
+
+    return most_popular_destination_occupants
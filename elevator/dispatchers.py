@@ -0,0 +1,30 @@
+# Dispatchers decide which car in a group answers each hall call. Add your own dispatcher here
+
+class NearestCar:
+    def __init__(self):
+        self.name = "NearestCar"
+
+    def assign(self, cars, origin, destination):
+        # Send the car closest to the caller, breaking ties with the car that has the fewest passengers to deal with
+        return min(range(len(cars)), key=lambda i: (abs(cars[i].elevator.position - origin),
+                                                    cars[i].building.state.outstanding))
+
+
+class LeastBusy:
+    def __init__(self):
+        self.name = "LeastBusy"
+
+    def assign(self, cars, origin, destination):
+        # Send the car with the fewest passengers waiting for or riding in it
+        return min(range(len(cars)), key=lambda i: cars[i].building.state.outstanding)
+
+
+class RoundRobin:
+    def __init__(self):
+        self.name = "RoundRobin"
+        self.next_car = 0
+
+    def assign(self, cars, origin, destination):
+        car = self.next_car % len(cars)
+        self.next_car += 1
+        return car
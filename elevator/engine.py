@@ -0,0 +1,114 @@
+import heapq
+
+from elevator import instrument
+from elevator.classes import PassengerStore, DecisionView
+from elevator.dispatchers import NearestCar
+from elevator.functions import make_cars, exchange_passengers, calculate_time
+
+# Kinds of event - the values also order events that happen at the same moment
+ARRIVAL = 0  # A passenger arrives and calls a lift
+DOORS_OPEN = 1  # A car reaches a floor and opens its doors
+DOORS_CLOSE = 2  # A car has finished letting passengers on and off and picks where to go next
+
+
+class EventEngine:
+    def __init__(self, config, algo, trace):
+        # Simulates in real seconds by jumping from one event to the next, so time spent idle costs nothing
+        self.cars = make_cars(config, algo)
+        self.dispatcher = config.get('dispatcher', NearestCar)()
+        self.trace = trace
+        self.total_passengers = PassengerStore(len(trace))
+        self.next_passenger = 0  # Index in the trace of the next passenger to arrive
+        self.delivered = 0  # Passengers that have reached their destination
+        self.time = 0  # Time of the event being handled (s)
+        self.events = []  # Heap of (time, kind, order, car index)
+        self.order = 0  # Tie breaker so events at the same time are handled in the order they were scheduled
+        self.busy = [False for car in self.cars]  # Whether each car has an event scheduled or is idle
+
+        self.schedule_arrival()
+
+    def schedule(self, time, kind, car=None):
+        heapq.heappush(self.events, (time, kind, self.order, car))
+        self.order += 1
+
+    def schedule_arrival(self):
+        # Only the next arrival is ever in the heap, so long traces are read from as the simulation reaches them
+        if self.next_passenger < len(self.trace):
+            self.schedule(float(self.trace.time[self.next_passenger]), ARRIVAL)
+
+    def finished(self):
+        return self.next_passenger == len(self.trace) and self.delivered == len(self.trace)
+
+    def run(self):
+        while self.step():
+            pass
+        return self.total_passengers
+
+    def step(self):
+        # Handles the next event, returns False once every passenger has been delivered
+        if not self.events or self.finished():
+            return False
+
+        self.time, kind, order, car_index = heapq.heappop(self.events)
+        self.total_passengers.iterations += 1
+
+        if kind == ARRIVAL:
+            self.arrival()
+        elif kind == DOORS_OPEN:
+            self.doors_open(car_index)
+        elif kind == DOORS_CLOSE:
+            self.doors_close(car_index)
+
+        return True
+
+    def arrival(self):
+        i = self.next_passenger
+        origin, destination = int(self.trace.origin[i]), int(self.trace.destination[i])
+        self.next_passenger += 1
+        self.schedule_arrival()
+
+        car_index = self.dispatcher.assign(self.cars, origin, destination)
+        car = self.cars[car_index]
+        passenger = self.total_passengers.add(origin, destination, self.time)
+        car.origins[origin].append(passenger)
+        car.destinations[destination].append(passenger)
+        car.building.state.arrive(passenger)
+
+        if not self.busy[car_index]:  # Wake an idle car up where it is
+            self.busy[car_index] = True
+            self.schedule(self.time, DOORS_OPEN, car_index)
+
+    def doors_open(self, car_index):
+        car = self.cars[car_index]
+        elevator = car.elevator
+        elevator.time = self.time
+
+        ts = instrument.start()
+        exit_passengers, n_waiting, boarded_passengers = exchange_passengers(elevator, car.building, car.origins,
+                                                                             car.destinations)
+        instrument.stop('exchange', ts)
+        self.delivered += len(exit_passengers)
+
+        dwell_time = (len(exit_passengers) + len(boarded_passengers)) * elevator.embark_disembark_time
+        self.schedule(self.time + dwell_time, DOORS_CLOSE, car_index)
+
+    def doors_close(self, car_index):
+        car = self.cars[car_index]
+        elevator = car.elevator
+        elevator.time = self.time
+
+        ts = instrument.start()
+        next_floor = car.algo.next_floor(DecisionView(car.building, elevator, car.origins, car.destinations))
+        instrument.decision(car.algo.name, ts)
+
+        if next_floor == elevator.position:
+            elevator.direction = -1 * elevator.direction
+            elevator.move(next_floor)
+            if car.building.state.pending():  # Open the doors again to pick up anyone who couldn't get on
+                self.schedule(self.time + elevator.embark_disembark_time, DOORS_OPEN, car_index)
+            else:  # Nothing to do so the car waits where it is until a passenger calls it
+                self.busy[car_index] = False
+            return
+
+        elevator.move(next_floor)
+        self.schedule(self.time + calculate_time(elevator, car.building, 0), DOORS_OPEN, car_index)
@@ -1,15 +1,21 @@
+import copy
 import json
-import math
-import matplotlib.pyplot as plt
 import numpy as np
 import os
-import pandas as pd
-import random
-import seaborn as sns
 import time
-
-from elevator.algorithms import SimpleUpDown
-from elevator.classes import Elevator, Passenger, Building
+import warnings
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from elevator import batched, instrument
+from elevator.algorithms import SimpleUpDown, as_array_algorithm
+from elevator.cache import result_cache
+from elevator.charts import render_charts
+from elevator.classes import Elevator, Passenger, Building, PassengerStore, Car, DecisionView
+from elevator.dispatchers import NearestCar
+from elevator.profiles import get_profile
+from elevator.results import ResultSink, ResultReader
+from elevator.stats import TimeSummary
+from elevator.traces import generate_trace, load_trace, save_trace
 from functools import wraps
 
 
@@ -27,64 +33,22 @@ def time_method(func):
     return timed
 
 
-def charts(name, df_journey_times, df_in_elevator_times):
-    df_journey_times.reset_index(drop=True, inplace=True)
-    for algo in df_journey_times:
-        df_journey_times[algo] = df_journey_times[algo].sort_values(ignore_index=True)
-    df_journey_times_95 = df_journey_times.head(round(len(df_journey_times) * 0.95))
-
-    df_in_elevator_times.reset_index(drop=True, inplace=True)
-    for algo in df_in_elevator_times:
-        df_in_elevator_times[algo] = df_in_elevator_times[algo].sort_values(ignore_index=True)
-    df_in_elevator_times_95 = df_in_elevator_times.head(round(len(df_in_elevator_times) * 0.95))
-
-    for df_name, df in {'journey': df_journey_times, 'elevator': df_in_elevator_times,
-                        'journey_95': df_journey_times_95,
-                        'elevator95': df_in_elevator_times_95}.items():
-        for plot in ['boxplot', 'violinplot', 'histogram']:
-            if plot == 'histogram':
-                for algo in df.columns:
-                    sns.histplot(df[algo])
-                    plt.savefig(f"output/{name}/{df_name}_{algo}_{df_name}.png")
-                    plt.clf()
-                continue
-            elif plot == 'boxplot':
-                sns.boxplot(data=df)
-            elif plot == 'violinplot':
-                sns.violinplot(data=df)
-            plt.savefig(f"output/{name}/{plot}_{df_name}.png")
-            plt.clf()
+def charts(name, df_journey_times, df_in_elevator_times, pool=None, workers=1):
+    # Figures are drawn in the pool (or a pool of their own when workers > 1) and only if their data have changed
+    return render_charts(f"output/{name}", df_journey_times, df_in_elevator_times, pool, workers)
 
 
 @time_method
-def run_simulation(config, algo=SimpleUpDown()):
-    try:
-        elevator = Elevator(config['max_occupancy'], algo.only_pickup_directional_passengers, config['acceleration'],
-                            config['max_speed'], config['embark_disembark_time'])
-    except AttributeError:
-        elevator = Elevator(config['max_occupancy'], False, config['acceleration'], config['max_speed'],
-                            config['embark_disembark_time'])
-    building = Building(config['n_floors'], config['storey_height'])
-
-    origins = {i: [] for i in range(building.floors)}
-    destinations = {i: [] for i in range(building.floors)}
-    total_passengers = []
-    n_passengers = config['n_passengers']
-
-    while bool([x for x in destinations.values() if x != []]) or n_passengers:
-        if n_passengers:
-            n_gen_passengers = random.randint(config['generate_range'][0],
-                                              min(config['generate_range'][1], n_passengers))
-            for i in range(n_gen_passengers):
-                passenger = generate_passenger(elevator.time, building, config['mode'])
-                origins[passenger.origin].append(passenger)
-                destinations[passenger.destination].append(passenger)
-                total_passengers.append(passenger)
-                n_passengers -= 1
-        run_iteration(elevator, building, algo, origins, destinations, total_passengers, config['draw'])
-
-    journey_times = [p.journey_time for p in total_passengers]
-    in_elevator_times = [p.time_in_elevator for p in total_passengers]
+def run_simulation(config, algo=SimpleUpDown(), rng=None, trace=None):
+    if rng is None:  # Each simulation draws from its own random stream so it can be reproduced from the seed
+        rng = np.random.default_rng(config.get('seed'))
+
+    trace = make_trace(config, rng, trace)
+
+    total_passengers = run_engine(config, algo, trace)
+
+    journey_times = total_passengers.journey_times()
+    in_elevator_times = total_passengers.in_elevator_times()
 
     average_journey = np.mean(journey_times)
     average_time_in_elevator = np.mean(in_elevator_times)
@@ -96,93 +60,243 @@ def run_simulation(config, algo=SimpleUpDown()):
     return journey_times, in_elevator_times
 
 
-def generate_passenger(time_step, building, mode="morning"):
+def run_engine(config, algo, trace):
+    # Runs one simulation of the trace on the engine picked in the config and returns its PassengerStore
+    engine = config.get('engine', 'tick')
+    ts = instrument.start()
+
+    if engine == 'compiled':
+        from elevator import compiled  # Imported here so processes that never use it don't pay for loading Numba
+
+    if engine == 'compiled' and not compiled.available():
+        warnings.warn("Numba is not installed, using the tick engine instead of the compiled engine")
+        engine = 'tick'
+    elif engine == 'compiled' and not compiled.supports(config, algo):
+        warnings.warn(f"The compiled engine doesn't support this config with {algo.name}, using the tick engine")
+        engine = 'tick'
+
+    if engine == 'compiled':
+        total_passengers = compiled.run_compiled(config, algo, trace)
+    elif engine == 'event':
+        from elevator.engine import EventEngine  # Imported here as the engine itself imports from this module
+        total_passengers = EventEngine(config, algo, trace).run()
+    else:  # A single simulation gains nothing from the batched engine so it runs on the tick engine
+        total_passengers = run_ticks(config, algo, trace)
+
+    instrument.stop('simulate', ts)
+    return total_passengers
+
+
+def make_trace(config, rng, trace=None):
+    if trace is None and config.get('trace'):  # Replay a saved trace instead of generating new passengers
+        trace = config['trace']
+    if isinstance(trace, str):
+        trace = load_trace(trace)
+    if trace is None and config.get('profile') is not None:  # Arrivals follow a traffic profile through the day
+        ts = instrument.start()
+        trace = get_profile(config['profile']).trace(config['n_floors'], rng, config.get('record_trace'))
+        instrument.stop('generate', ts)
+    if trace is None:  # All the passengers are generated up front and then fed in as the simulation reaches them
+        ts = instrument.start()
+        trace = generate_trace(config, rng)
+        instrument.stop('generate', ts)
+        if config.get('record_trace'):
+            save_trace(config['record_trace'], trace)
+    return trace
+
+
+def make_cars(config, algo):
+    cars = []
+    for i in range(config.get('n_cars', 1)):
+        car_algo = as_array_algorithm(algo if i == 0 else copy.deepcopy(algo))  # Each car runs its own copy of the algorithm
+        try:
+            elevator = Elevator(config['max_occupancy'], algo.only_pickup_directional_passengers,
+                                config['acceleration'], config['max_speed'], config['embark_disembark_time'])
+        except AttributeError:
+            elevator = Elevator(config['max_occupancy'], False, config['acceleration'], config['max_speed'],
+                                config['embark_disembark_time'])
+        cars.append(Car(elevator, Building(config['n_floors'], config['storey_height']), car_algo))
+    return cars
+
+
+def run_ticks(config, algo, trace):
+    # Moves the lift once per iteration, spawning the passengers the trace has for that iteration first. A group of
+    # lifts, or passengers arriving by a traffic profile, run in real time instead
+    cars = make_cars(config, algo)
+    if len(cars) > 1 or config.get('profile') is not None:
+        return run_real_time(config, cars, trace)
+
+    car = cars[0]
+    n_passengers = len(trace)
+    total_passengers = PassengerStore(n_passengers)
+    next_passenger = 0
+    step = 0
+
+    while car.building.state.pending() or next_passenger < n_passengers:
+        if next_passenger < n_passengers:
+            ts = instrument.start()
+            end = trace.arrivals(next_passenger, step)
+            for origin, destination in zip(trace.origin[next_passenger:end].tolist(),
+                                           trace.destination[next_passenger:end].tolist()):
+                add_passenger(car, total_passengers, origin, destination, car.elevator.time)
+            next_passenger = end
+            instrument.stop('spawn', ts)
+        run_iteration(car.elevator, car.building, car.algo, car.origins, car.destinations, total_passengers,
+                      config['draw'])
+        step += 1
+
+    total_passengers.iterations = step
+    return total_passengers
+
+
+def run_real_time(config, cars, trace):
+    # Each lift keeps its own clock and the busy lift furthest behind moves next, with passengers arriving at their
+    # times in the trace whenever they come before it, so no lift waits for the others to finish their moves. As on
+    # the event engine, a lift is idle from when it stays put with nothing to do until a passenger is given to it
+    dispatcher = config.get('dispatcher', NearestCar)()
+    n_passengers = len(trace)
+    total_passengers = PassengerStore(n_passengers)
+    next_passenger = 0
+    step = 0
+    idle = [True for car in cars]
+
+    while next_passenger < n_passengers or any(car.building.state.pending() for car in cars):
+        busy = [car for car, car_idle in zip(cars, idle) if not car_idle]
+        earliest = min(busy, key=lambda car: car.elevator.time) if busy else None
+
+        if next_passenger < n_passengers and (earliest is None or
+                                              trace.time[next_passenger] <= earliest.elevator.time):
+            ts = instrument.start()
+            arrival = float(trace.time[next_passenger])
+            origin, destination = int(trace.origin[next_passenger]), int(trace.destination[next_passenger])
+            car_index = dispatcher.assign(cars, origin, destination)  # Hall calls are given to one car on arrival
+            car = cars[car_index]
+            if idle[car_index]:  # Wake an idle lift up where it is
+                idle[car_index] = False
+                car.elevator.time = max(car.elevator.time, arrival)
+            add_passenger(car, total_passengers, origin, destination, arrival)
+            next_passenger += 1
+            instrument.stop('spawn', ts)
+        else:
+            elevator = earliest.elevator
+            position, start = elevator.position, elevator.time
+            run_iteration(elevator, earliest.building, earliest.algo, earliest.origins, earliest.destinations,
+                          total_passengers, config['draw'], False)
+            if elevator.position == position and not earliest.building.state.pending():
+                idle[cars.index(earliest)] = True
+            elif elevator.time == start:  # Nobody could get on or off and it stayed put, so it tries again in a moment
+                elevator.time += elevator.embark_disembark_time
+            step += 1
+
+    total_passengers.iterations = step
+    return total_passengers
+
+
+def add_passenger(car, total_passengers, origin, destination, journey_start):
+    passenger = total_passengers.add(origin, destination, journey_start)
+    car.origins[passenger.origin].append(passenger)
+    car.destinations[passenger.destination].append(passenger)
+    car.building.state.arrive(passenger)
+
+
+def generate_passenger(time_step, building, mode="morning", rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+
     if mode == "random":
-        origin, destination = random.sample(range(0, building.floors), 2)
+        origin, destination = (int(f) for f in rng.choice(building.floors, 2, replace=False))
     elif mode == "morning":
-        origin = random.choice([*[0 for i in range(building.floors * 4)], *range(1, building.floors)])
-        destination = random.choice([i for i in range(0, building.floors) if i != origin])
+        origin = int(rng.choice([*[0 for i in range(building.floors * 4)], *range(1, building.floors)]))
+        destination = int(rng.choice([i for i in range(0, building.floors) if i != origin]))
     elif mode == "evening":
-        destination = random.choice([*[0 for i in range(building.floors * 9)], *range(1, building.floors)])
-        origin = random.choice([i for i in range(0, building.floors) if i != destination])
+        destination = int(rng.choice([*[0 for i in range(building.floors * 9)], *range(1, building.floors)]))
+        origin = int(rng.choice([i for i in range(0, building.floors) if i != destination]))
     else:
         raise Exception("Incorrect mode supplied")
     return Passenger(origin, destination, time_step)
 
 
-def run_iteration(elevator, building, algo, origins, destinations, total_passengers, draw_enabled):
+def run_iteration(elevator, building, algo, origins, destinations, total_passengers, draw_enabled, charge_waiting=True):
+    # charge_waiting charges boarding time for everyone waiting on the floor, as iteration-based simulations always
+    # have - otherwise only the passengers who actually get on and off are charged, as in real time
     if draw_enabled:
         time.sleep(0.5)
 
+    algo = as_array_algorithm(algo)
+
+    ts = instrument.start()
+    exit_passengers, n_waiting, boarded_passengers = exchange_passengers(elevator, building, origins, destinations)
+    instrument.stop('exchange', ts)
+
+    if draw_enabled:
+        draw(building, origins, elevator, total_passengers)
+
+    ts = instrument.start()
+    next_floor = algo.next_floor(DecisionView(building, elevator, origins, destinations))
+    instrument.decision(algo.name, ts)
+
+    if next_floor == elevator.position:
+        elevator.direction = -1 * elevator.direction
+
+    elevator.move(next_floor)
+
+    ts = instrument.start()
+    n_moved = n_waiting if charge_waiting else len(boarded_passengers)
+    elevator.time += calculate_time(elevator, building, n_moved + len(exit_passengers))
+    instrument.stop('calculate_time', ts)
+
+
+def exchange_passengers(elevator, building, origins, destinations):
+    # Lets passengers off and then on at the current floor. Returns the passengers that got off, how many were
+    # waiting on the floor and the passengers that got on. Only the passengers that move are touched, so this costs
+    # the same however long the queue on the floor is
     current_floor = elevator.position
+    waiting = origins[current_floor]
 
     exit_passengers = elevator.exit_passengers()
     for p in exit_passengers:
         destinations[current_floor].remove(p)
+        building.state.alight(p)
         p.get_off = elevator.time
         p.complete_journey(elevator.time)
 
-    enter_passengers = origins[current_floor].copy()
-
-    occupant_destinations = [p.destination for p in elevator.occupants]
+    n_waiting = len(waiting)
 
     take_all_passengers = False
 
-    if len(set([p.direction for p in enter_passengers])) != 2:
+    if not (waiting.up and waiting.down):
         if not elevator.occupants:
             take_all_passengers = True
         else:
-            for d in occupant_destinations:
+            for d in elevator.by_destination:
                 if np.sign(d - elevator.position) == -1 * elevator.direction:
                     take_all_passengers = True
                     break
 
-    for p in enter_passengers:
-        if len(elevator.occupants) == elevator.max_occupancy:
-            break
-        if elevator.directional_passengers:
-            if p.direction == elevator.direction or elevator.position == 0 or elevator.position == building.floors - 1 or take_all_passengers:
-                elevator.enter_passenger(p)
-                p.get_on = elevator.time
-                origins[current_floor].remove(p)
-        else:
-            elevator.enter_passenger(p)
-            p.get_on = elevator.time
-            origins[current_floor].remove(p)
-
-    if draw_enabled:
-        draw(building, origins, elevator, total_passengers)
+    direction = None  # Everyone on the floor can get on
+    if elevator.directional_passengers and not (elevator.position == 0 or elevator.position == building.floors - 1
+                                                or take_all_passengers):
+        direction = elevator.direction
 
-    next_floor = algo.next_floor(building, elevator, origins, destinations)
-
-    if next_floor == elevator.position:
-        elevator.direction = -1 * elevator.direction
+    boarded_passengers = waiting.take(elevator.max_occupancy - len(elevator.occupants), direction)
+    for p in boarded_passengers:
+        elevator.enter_passenger(p)
+        p.get_on = elevator.time
+        building.state.board(p)
 
-    elevator.move(next_floor)
+    building.state.update_floor(current_floor, waiting)
 
-    elevator.time += calculate_time(elevator, building, len(enter_passengers) + len(exit_passengers))
+    return exit_passengers, n_waiting, boarded_passengers
 
 
 def calculate_time(elevator, building, n_passengers):
-    storey_height = building.storey_height
-    acceleration = elevator.acceleration
-    max_speed = elevator.speed
-
     embark_disembark_time = n_passengers * elevator.embark_disembark_time
 
-    distance_traveled = storey_height * abs(elevator.position - elevator.previous_floor)
-
-    acceleration_distance = (max_speed ** 2) / (2 * acceleration)
-
-    if acceleration_distance > distance_traveled:
-        travel_time = 2 * math.sqrt((2 * distance_traveled) / acceleration)
-    else:
-        acceleration_time = (1 / 2) * (acceleration_distance) / max_speed
-        max_speed_distance = distance_traveled - acceleration_distance
-        max_speed_time = max_speed_distance / max_speed
-        travel_time = 2 * acceleration_time + max_speed_time
+    # Travel times are looked up from a table worked out once per building and lift
+    travel_time = building.travel_time_table(elevator.acceleration, elevator.speed)[elevator.previous_floor,
+                                                                                    elevator.position]
 
-    return embark_disembark_time + travel_time
+    return embark_disembark_time + float(travel_time)
 
 
 def draw(building, origins, elevator, total_passengers):
@@ -224,11 +338,96 @@ def batch_test(config):
             test_config["n_passengers"] = 100
         tests[name] = test_config
 
-    for name, test_config in tests.items():
-        run_test(name, test_config)
+    workers = config.get("workers", 1)
+
+    if workers > 1:  # Share one pool between every scenario rather than starting a new one each time
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name, test_config in tests.items():
+                run_test(name, test_config, pool)
+    else:
+        for name, test_config in tests.items():
+            run_test(name, test_config)
+
+
+def task_seed(seed, iteration):
+    # Derive an independent, reproducible seed for one iteration from the base seed - every algorithm in the
+    # iteration uses the same seed so they are all scored on the same passengers
+    return int(np.random.SeedSequence([seed, iteration]).generate_state(1)[0])
 
 
-def run_test(name, config):
+def run_task(config, algo_class, seeds):
+    # Runs one algorithm for the iterations with the given seeds - module level so it can be sent to a worker process.
+    # Returns the results and, if the config turns it on, the Instrumentation collected while running them
+    if not config.get("instrument"):
+        return run_seeds(config, algo_class, seeds), None
+
+    with instrument.collecting() as instrumentation:
+        results = run_seeds(config, algo_class, seeds)
+    return results, instrumentation
+
+
+def run_seeds(config, algo_class, seeds):
+    if config.get("engine") == "batched" and batched.supports(config, algo_class()):
+        ts = time.time()
+        traces = [make_trace(config, np.random.default_rng(seed)) for seed in seeds]
+        ts_batch = instrument.start()
+        results = batched.run_batch(config, algo_class(), traces)
+        instrument.stop('simulate', ts_batch)
+        print(f"{algo_class.__name__}: batch of {len(seeds)} simulations took %2.3f seconds to run." % (time.time() - ts))
+    else:
+        results = [run_simulation(config=config, algo=algo_class(), rng=np.random.default_rng(seed)) for seed in seeds]
+
+    cache = result_cache(config)
+    if cache is not None:  # Saved by whichever process ran them, before they are cut down to summaries
+        for seed, (journey_times, in_elevator_times) in zip(seeds, results):
+            cache.put(cache.key(config, algo_class, seed), journey_times, in_elevator_times)
+
+    return [task_result(config, journey_times, in_elevator_times) for journey_times, in_elevator_times in results]
+
+
+def task_result(config, journey_times, in_elevator_times):
+    if config.get("keep_results", True):
+        return journey_times, in_elevator_times
+
+    summary = TimeSummary()  # Only send back the summary, which is the same size however many passengers there are
+    summary.add(journey_times, in_elevator_times)
+    return summary
+
+
+def test_jobs(config, cells):
+    # Splits the (algorithm, iteration) cells of a test that need simulating into (algorithm, iterations) jobs - one
+    # iteration each, or batches of iterations for algorithms the batched engine can run
+    jobs = []
+    batches = {}
+
+    for algo, i in cells:
+        if config.get("engine") == "batched" and batched.supports(config, algo):
+            batches.setdefault(algo, []).append(i)
+        else:
+            jobs.append((algo, [i]))
+
+    for algo, iterations in batches.items():
+        batch_size = config.get("batch_size") or len(iterations)
+        for start in range(0, len(iterations), batch_size):
+            jobs.append((algo, iterations[start:start + batch_size]))
+
+    return jobs
+
+
+def cached_cells(config, cells, cache):
+    # Splits (algorithm, iteration) cells into (algorithm, iteration, result) for those already in the cache and the
+    # cells still to simulate
+    cached, missing = [], []
+    for algo, i in cells:
+        times = cache.get(cache.key(config, type(algo), task_seed(config["seed"], i))) if cache else None
+        if times is None:
+            missing.append((algo, i))
+        else:
+            cached.append((algo, i, task_result(config, *times)))
+    return cached, missing
+
+
+def run_test(name, config, pool=None):
     algos = [algo() for algo in config["algos"]]
 
     iterations = config["iterations"]
@@ -238,39 +437,133 @@ def run_test(name, config):
         run_simulation(config=config, algo=algos[0])
         exit()
 
-    df_journey_times = pd.DataFrame(columns=[a.name for a in algos],
-                                    index=[[i for i in range(iterations) for j in range(config['n_passengers'])],
-                                           [i for j in range(iterations) for i in range(config['n_passengers'])]])
+    if config.get("trace"):  # A replayed trace decides how many passengers there are
+        config["n_passengers"] = len(load_trace(config["trace"]))
 
-    df_in_elevator_times = pd.DataFrame(columns=[a.name for a in algos],
-                                        index=[[i for i in range(iterations) for j in range(config['n_passengers'])],
-                                               [i for j in range(iterations) for i in range(config['n_passengers'])]])
+    if config.get("seed") is None:  # Pick a seed and keep it in the config so the run can be reproduced
+        config["seed"] = np.random.SeedSequence().entropy
 
-    for i in range(iterations):
-        for algo in algos:
+    record_trace = config.get("record_trace")
+    if record_trace:  # The first iteration's trace is recorded once here, rather than by every simulation
+        make_trace(config, np.random.default_rng(task_seed(config["seed"], 0)))
+        config = dict(config, record_trace=None)
+
+    keep_results = config.get("keep_results", True)
+    summaries = {a.name: TimeSummary() for a in algos}
+    instrumentation = instrument.Instrumentation() if config.get("instrument") else None
+
+    # Results are streamed to disk in chunks as each simulation finishes rather than held in one big table
+    if keep_results:
+        sink = ResultSink(f"output/{name}/results", [a.name for a in algos], config.get("chunk_size", 65536))
+
+    def save(i, algo, result):
+        ts_save = time.time()
+        if keep_results:
+            journey_times, in_elevator_times = result
+            sink.append(algo.name, i, journey_times, in_elevator_times)
+            summaries[algo.name].add(journey_times, in_elevator_times)
+        else:
+            summaries[algo.name].merge(result)
+        te = time.time()
+        if instrumentation is not None:
+            instrumentation.record('save', te - ts_save)
+        print("Save time - %2.3f seconds" % (te - ts_save))
+        return te
+
+    def merge(task_instrumentation):
+        if task_instrumentation is not None:  # Each job (possibly in another process) collects its own
+            instrumentation.merge(task_instrumentation)
+
+    # Results already in the cache are used as they are, so only the missing cells are simulated
+    cache = result_cache(config)
+    cached, cells = cached_cells(config, [(algo, i) for i in range(iterations) for algo in algos], cache)
+    for algo, i, result in cached:
+        save(i, algo, result)
+    if cache is not None:
+        print(f"{len(cached)} of {len(algos) * iterations} simulations found in the cache")
+
+    jobs = test_jobs(config, cells)
+
+    workers = config.get("workers", 1)
+
+    if pool is None and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as test_pool:
+            run_tasks(test_pool, config, jobs, save, merge)
+    elif pool is not None:
+        run_tasks(pool, config, jobs, save, merge)
+    else:
+        for algo, job_iterations in jobs:
             ts = time.time()
-            journey_times, in_elevator_times = run_simulation(config=config, algo=algo)
-            ts_save = time.time()
-            df_journey_times.loc[(i, list(range(config['n_passengers']))), algo.name] = journey_times
-            df_in_elevator_times.loc[(i, list(range(config['n_passengers']))), algo.name] = in_elevator_times
-            te = time.time()
-            print(f"Save time - %2.3f seconds" % (te - ts_save))
-            print(f"Total time - %2.3f seconds" % (te - ts))
+            results, task_instrumentation = run_task(config, type(algo),
+                                                     [task_seed(config["seed"], i) for i in job_iterations])
+            merge(task_instrumentation)
+            for i, result in zip(job_iterations, results):
+                te = save(i, algo, result)
+            print("Total time - %2.3f seconds" % (te - ts))
             print()
 
-    if not os.path.exists(f"output"):
-        os.mkdir(f"output")
-    if not os.path.exists(f"output/{name}"):
-        os.mkdir(f"output/{name}")
+    os.makedirs(f"output/{name}", exist_ok=True)
+
+    summary = {algo_name: s.to_dict() for algo_name, s in summaries.items()}
+    for algo_name, s in summary.items():
+        print(f"{algo_name}: journey p50 {round(s['journey']['p50'], 1)}, p95 {round(s['journey']['p95'], 1)}, "
+              f"p99 {round(s['journey']['p99'], 1)} (seconds)")
 
-    df_journey_times.to_csv(f"output/{name}/journey_times.csv")
-    df_in_elevator_times.to_csv(f"output/{name}/elevator_times.csv")
+    with open(f"output/{name}/summary.json", 'w') as f:
+        json.dump(summary, f, indent=2)
 
     save_config = config.copy()
+    save_config["record_trace"] = record_trace
 
     save_config["algos"] = [algo.__name__ for algo in config["algos"]]
+    if "dispatcher" in save_config:
+        save_config["dispatcher"] = save_config["dispatcher"].__name__
+    if save_config.get("profile") is not None:
+        save_config["profile"] = get_profile(save_config["profile"]).to_dict()
 
     with open(f"output/{name}/config.json", 'w') as f:
         json.dump(save_config, f)
 
-    charts(name, df_journey_times, df_in_elevator_times)
+    if keep_results:
+        ts = time.time()
+        sink.close()
+
+        df_journey_times, df_in_elevator_times = ResultReader(f"output/{name}/results").to_dataframes()
+
+        df_journey_times.to_csv(f"output/{name}/journey_times.csv")
+        df_in_elevator_times.to_csv(f"output/{name}/elevator_times.csv")
+        if instrumentation is not None:
+            instrumentation.record('write', time.time() - ts)
+
+        ts = time.time()
+        charts(name, df_journey_times, df_in_elevator_times, pool, workers)
+        if instrumentation is not None:
+            instrumentation.record('charts', time.time() - ts)
+
+    if cache is not None:
+        cache.evict()
+
+    if instrumentation is not None:
+        instrumentation.dump(f"output/{name}/instrumentation.json")
+
+    return instrumentation
+
+
+def run_tasks(pool, config, jobs, save, merge):
+    # Submit every job to the pool and merge the results as they finish
+    ts = time.time()
+
+    futures = {}
+    for algo, job_iterations in jobs:
+        future = pool.submit(run_task, config, type(algo), [task_seed(config["seed"], i) for i in job_iterations])
+        futures[future] = (algo, job_iterations)
+
+    for future in as_completed(futures):
+        algo, job_iterations = futures[future]
+        results, task_instrumentation = future.result()
+        merge(task_instrumentation)
+        for i, result in zip(job_iterations, results):
+            save(i, algo, result)
+
+    print("Total time - %2.3f seconds" % (time.time() - ts))
+    print()
@@ -0,0 +1,144 @@
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+from elevator.stats import Summary
+
+# Instrumentation collecting timings in this process, or None when it is switched off. The hot path only calls
+# start/stop/decision, which do nothing but check this when it is None
+current = None
+
+
+class Instrumentation:
+    def __init__(self):
+        # Where the time of one or more simulations went, mergeable so workers can each send theirs back
+        self.phases = {}  # Phase name: [total time (s), calls]
+        self.decisions = {}  # Algorithm name: Summary of how long next_floor took (s)
+        self.latencies = {}  # Algorithm name: decision times not yet added to its summary
+        self.profile = None  # Slowest functions from cProfile, when a simulation was profiled
+        self.memory = None  # Peak and largest allocations from tracemalloc, when a simulation was profiled
+
+    def record(self, phase, elapsed):
+        totals = self.phases.get(phase)
+        if totals is None:
+            self.phases[phase] = [elapsed, 1]
+        else:
+            totals[0] += elapsed
+            totals[1] += 1
+
+    def record_decision(self, algo_name, elapsed):
+        self.record('decide', elapsed)
+        latencies = self.latencies.setdefault(algo_name, [])
+        latencies.append(elapsed)
+        if len(latencies) >= 4096:  # Added to the summary in blocks as adding one value at a time is slow
+            self.flush(algo_name)
+
+    def flush(self, algo_name=None):
+        for name in [algo_name] if algo_name else list(self.latencies):
+            self.decisions.setdefault(name, Summary()).add(self.latencies.pop(name, []))
+
+    def merge(self, other):
+        other.flush()
+        self.flush()
+        for phase, (elapsed, calls) in other.phases.items():
+            totals = self.phases.setdefault(phase, [0.0, 0])
+            totals[0] += elapsed
+            totals[1] += calls
+        for algo_name, summary in other.decisions.items():
+            self.decisions.setdefault(algo_name, Summary()).merge(summary)
+        self.profile = self.profile or other.profile
+        self.memory = self.memory or other.memory
+
+    def to_dict(self):
+        self.flush()
+        result = {
+            'phases': {phase: {'total_time': elapsed, 'calls': calls, 'mean_time': elapsed / calls}
+                       for phase, (elapsed, calls) in sorted(self.phases.items(), key=lambda p: -p[1][0])},
+            'decisions': {algo_name: dict(summary.to_dict(), histogram=histogram(summary))
+                          for algo_name, summary in self.decisions.items()},
+        }
+        if self.profile is not None:
+            result['profile'] = self.profile
+        if self.memory is not None:
+            result['memory'] = self.memory
+        return result
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def histogram(summary):
+    # Decision times bucketed by the bins of the summary's sketch, as upper bound of the bin (s): count
+    sketch = summary.sketch
+    buckets = {}
+    if sketch.zero_count:
+        buckets[f"{sketch.min_value:.3g}"] = sketch.zero_count
+    for key in sorted(sketch.bins):
+        buckets[f"{sketch.gamma ** key:.3g}"] = sketch.bins[key]
+    return buckets
+
+
+def start():
+    return time.perf_counter() if current is not None else None
+
+
+def stop(phase, ts):
+    if ts is not None and current is not None:
+        current.record(phase, time.perf_counter() - ts)
+
+
+def decision(algo_name, ts):
+    if ts is not None and current is not None:
+        current.record_decision(algo_name, time.perf_counter() - ts)
+
+
+@contextmanager
+def collecting(instrumentation=None):
+    # Collects into instrumentation (or a new one) inside the with block
+    global current
+    previous = current
+    current = Instrumentation() if instrumentation is None else instrumentation
+    try:
+        yield current
+    finally:
+        current.flush()
+        current = previous
+
+
+def profile_simulation(config, algo, rng=None, top=25, memory=True):
+    # Runs one simulation with the instrumentation on under cProfile, and tracemalloc if memory is set. Returns the
+    # simulation's results and the Instrumentation
+    from elevator.functions import run_simulation  # Imported here as functions imports this module
+
+    with collecting() as instrumentation:
+        profiler = cProfile.Profile()
+        if memory:
+            tracemalloc.start()
+        profiler.enable()
+        try:
+            result = run_simulation(config=config, algo=algo, rng=rng)
+        finally:
+            profiler.disable()
+            if memory:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:top]  # By cumulative time
+    instrumentation.profile = [{'function': f"{file}:{line}({name})", 'calls': calls, 'total_time': total_time,
+                                'cumulative_time': cumulative_time}
+                               for (file, line, name), (_, calls, total_time, cumulative_time, _) in rows]
+
+    if memory:
+        instrumentation.memory = {
+            'peak': peak,
+            'top': [{'location': str(stat.traceback), 'size': stat.size, 'count': stat.count}
+                    for stat in snapshot.statistics('lineno')[:top]],
+        }
+
+    return result, instrumentation
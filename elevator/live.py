@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import json
+import numpy as np
+
+from elevator import algorithms
+from elevator.engine import EventEngine
+from elevator.functions import make_trace
+
+FRAME_RATE = 20  # Most frames a second each simulation publishes - events in between are merged into one frame
+MAX_FRAMES = 64  # Frames queued for a subscriber before newer ones are dropped for it
+FLUSH_TIMEOUT = 5  # Seconds clients get to read the last frames once the simulations finish before they are cut off
+
+# Scenario the command line builds its simulations from
+LIVE_CONFIG = dict(
+    mode="morning",
+    draw=False,
+    max_occupancy=12,
+    n_floors=20,
+    n_passengers=200,
+    generate_range=(0, 2),
+    acceleration=1.5,
+    max_speed=6.7,
+    storey_height=4,
+    embark_disembark_time=1,
+    n_cars=1,
+    profile=None,
+    seed=None,
+)
+
+
+class Feed:
+    def __init__(self, max_frames=MAX_FRAMES):
+        # Fans the frames of any number of simulations out to any number of subscribers. Publishing never waits: a
+        # subscriber whose queue is full misses the frame and gets the full state of that simulation next time
+        # instead of a delta, so a slow consumer only sees fewer frames and never holds the simulations up
+        self.max_frames = max_frames
+        self.subscribers = set()
+        self.states = {}  # Simulation name: latest full state, for subscribers that join part way through
+
+    def publish(self, simulation, state, delta):
+        self.states[simulation] = state
+        full_line = delta_line = None  # Each frame is encoded once however many subscribers there are
+        for subscriber in list(self.subscribers):
+            if simulation in subscriber.synced:
+                delta_line = delta_line or encode(simulation, delta, False)
+                line = delta_line
+            else:
+                full_line = full_line or encode(simulation, state, True)
+                line = full_line
+            if subscriber.queue.qsize() < self.max_frames:
+                subscriber.queue.put_nowait(line)
+                subscriber.synced.add(simulation)
+            else:
+                subscriber.dropped += 1
+                subscriber.synced.discard(simulation)
+
+    def subscribe(self, writer=None):
+        subscriber = Subscriber(writer)
+        for simulation, state in self.states.items():  # Start from the current state of everything running
+            subscriber.queue.put_nowait(encode(simulation, state, True))
+            subscriber.synced.add(simulation)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def close(self):
+        # Sends every subscriber the final state of each simulation it has fallen behind on, then the end of the feed
+        for subscriber in self.subscribers:
+            for simulation, state in self.states.items():
+                if simulation not in subscriber.synced:
+                    subscriber.queue.put_nowait(encode(simulation, state, True))
+            subscriber.queue.put_nowait(None)
+
+    async def flushed(self):
+        # Waits for every subscriber to read to the end of the feed and disconnect
+        while self.subscribers:
+            await asyncio.sleep(0.1)
+
+    def disconnect(self):
+        # Drops the connections of subscribers still behind, along with whatever they have not read, which wakes up
+        # their serve_client stuck waiting for the connection to drain
+        for subscriber in list(self.subscribers):
+            if subscriber.writer is not None:
+                subscriber.writer.transport.abort()
+
+    async def serve_client(self, reader, writer):
+        # Writes frames to one connection as JSON lines until it closes
+        subscriber = self.subscribe(writer)
+        try:
+            while (line := await subscriber.queue.get()) is not None:
+                writer.write(line)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.unsubscribe(subscriber)
+            writer.close()
+
+
+class Subscriber:
+    def __init__(self, writer=None):
+        self.writer = writer  # Connection the frames are written to, so it can be cut off if it stops reading
+        self.queue = asyncio.Queue()  # Kept to max_frames by Feed.publish, which drops frames rather than waiting
+        self.synced = set()  # Simulations whose last frame reached this subscriber, so it can be sent deltas
+        self.dropped = 0
+
+
+def encode(simulation, frame, full):
+    return (json.dumps(dict(frame, simulation=simulation, full=full)) + "\n").encode()
+
+
+class LiveSimulation:
+    def __init__(self, name, config, algo, feed, speed=1.0):
+        # Runs the event engine in simulated time speed times faster than real time (or as fast as it can if speed
+        # is 0), publishing the state of its cars and floors to the feed
+        rng = np.random.default_rng(config.get('seed'))
+        self.name = name
+        self.engine = EventEngine(config, algo, make_trace(config, rng))
+        self.feed = feed
+        self.speed = speed
+        self.state = None
+
+    def snapshot(self):
+        waiting = sum(car.building.state.waiting_up + car.building.state.waiting_down for car in self.engine.cars)
+        return {
+            'time': self.engine.time,
+            'delivered': self.engine.delivered,
+            'cars': {str(i): {'position': int(car.elevator.position), 'direction': int(car.elevator.direction),
+                              'occupants': len(car.elevator.occupants)} for i, car in enumerate(self.engine.cars)},
+            'waiting': {str(floor): int(count) for floor, count in enumerate(waiting)},
+        }
+
+    def publish(self, finished=False):
+        state = self.snapshot()
+        delta = {'time': state['time'], 'delivered': state['delivered']}
+        for key in ['cars', 'waiting']:  # Only what has changed since the last frame
+            previous = self.state[key] if self.state else {}
+            delta[key] = {i: value for i, value in state[key].items() if previous.get(i) != value}
+        if finished:
+            journey_times = self.engine.total_passengers.journey_times()
+            state['finished'] = delta['finished'] = True
+            state['mean_journey_time'] = delta['mean_journey_time'] = float(np.mean(journey_times)) \
+                if len(journey_times) else None
+        self.state = state
+        self.feed.publish(self.name, state, delta)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        last_frame = -np.inf
+        self.publish()
+
+        while self.engine.step():
+            now = loop.time()
+            if self.speed:
+                delay = start + self.engine.time / self.speed - now
+                if delay > 0:  # Wait for real time to catch up, letting the other simulations and clients run
+                    if now - last_frame >= 1 / FRAME_RATE:
+                        self.publish()
+                        last_frame = now
+                    await asyncio.sleep(delay)
+                    continue
+            if now - last_frame >= 1 / FRAME_RATE:
+                self.publish()
+                last_frame = now
+                await asyncio.sleep(0)  # Running flat out, so give way once a frame
+
+        self.publish(finished=True)
+
+
+async def serve(simulations, feed, host="127.0.0.1", port=8765, path=None, flush_timeout=FLUSH_TIMEOUT):
+    # Runs the simulations while streaming them to every client of a TCP (or Unix socket if path is set) server
+    if path:
+        server = await asyncio.start_unix_server(feed.serve_client, path)
+    else:
+        server = await asyncio.start_server(feed.serve_client, host, port)
+    async with server:
+        await asyncio.gather(*(simulation.run() for simulation in simulations))
+        feed.close()
+        try:  # Let clients read the last frames, but don't wait forever on one that has stopped reading
+            await asyncio.wait_for(feed.flushed(), flush_timeout)
+        except asyncio.TimeoutError:
+            feed.disconnect()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m elevator.live",
+                                     description="Run simulations in real time, streaming their state as JSON lines")
+    parser.add_argument("--algos", nargs="+", default=["NormalLift"], help="algorithms to run side by side")
+    parser.add_argument("--speed", type=float, default=10, help="times faster than real time, 0 for flat out")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="serve on a Unix socket instead of TCP")
+    parser.add_argument("--floors", type=int, default=LIVE_CONFIG['n_floors'])
+    parser.add_argument("--passengers", type=int, default=LIVE_CONFIG['n_passengers'])
+    parser.add_argument("--cars", type=int, default=LIVE_CONFIG['n_cars'])
+    parser.add_argument("--profile", help="traffic profile to generate arrivals from, e.g. office_day")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    config = dict(LIVE_CONFIG, n_floors=args.floors, n_passengers=args.passengers, n_cars=args.cars,
+                  profile=args.profile, seed=args.seed)
+    feed = Feed()
+    simulations = [LiveSimulation(name, config, getattr(algorithms, name)(), feed, args.speed) for name in args.algos]
+
+    asyncio.run(serve(simulations, feed, args.host, args.port, args.unix))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import math
+import numpy as np
+
+from numpy.lib.format import open_memmap
+from elevator.traces import Trace, TRACE_DTYPE, floor_weights, load_trace, trace_path
+
+CHUNK = 2 ** 20  # Most passengers generated at once, so a long profile is written out a piece at a time
+
+
+class TrafficProfile:
+    def __init__(self, windows, end, interpolate=False):
+        # Arrival rates that change through the day. windows is a list of (start (s), rate (passengers/s), pattern),
+        # in order, and the profile ends at end (s). The rate of a window is held until the next one starts, or if
+        # interpolate is set changes linearly to the rate of the next one. The pattern is where passengers go in
+        # that window - morning, evening, lunch, random or an origin x destination matrix of weights
+        if not windows or windows[0][0] != 0:
+            raise Exception("The first window of a traffic profile must start at 0")
+        if any(a[0] >= b[0] for a, b in zip(windows, windows[1:])) or windows[-1][0] >= end:
+            raise Exception("The windows of a traffic profile must be in order and start before it ends")
+        if any(rate < 0 for _, rate, _ in windows):
+            raise Exception("Arrival rates can't be negative")
+        self.windows = [(float(start), float(rate), pattern) for start, rate, pattern in windows]
+        self.end = float(end)
+        self.interpolate = interpolate
+
+    def segments(self):
+        # (start, end, rate at start, rate at end, pattern) of every window
+        segments = []
+        for i, (start, rate, pattern) in enumerate(self.windows):
+            end = self.windows[i + 1][0] if i + 1 < len(self.windows) else self.end
+            end_rate = self.windows[i + 1][1] if self.interpolate and i + 1 < len(self.windows) else rate
+            segments.append((start, end, rate, end_rate, pattern))
+        return segments
+
+    def rate(self, time):
+        # Arrival rate at each of the given times
+        time = np.asarray(time, dtype=float)
+        rate = np.zeros(time.shape)
+        for start, end, start_rate, end_rate, _ in self.segments():
+            inside = (time >= start) & (time < end)
+            rate[inside] = start_rate + (end_rate - start_rate) * (time[inside] - start) / (end - start)
+        return rate
+
+    def expected_passengers(self):
+        return sum((start_rate + end_rate) / 2 * (end - start) for start, end, start_rate, end_rate, _
+                   in self.segments())
+
+    def repeat(self, days):
+        # The profile run back to back the given number of times, e.g. a week of days
+        windows = [(start + day * self.end, rate, pattern) for day in range(days) for start, rate, pattern
+                   in self.windows]
+        return TrafficProfile(windows, self.end * days, self.interpolate)
+
+    def scale(self, factor):
+        return TrafficProfile([(start, rate * factor, pattern) for start, rate, pattern in self.windows], self.end,
+                              self.interpolate)
+
+    def trace(self, floors, rng, path=None):
+        # Passengers arriving over the whole profile. With a path the trace is written straight into a memory mapped
+        # .npy file there, so only one piece of at most CHUNK passengers is ever held in memory
+        pieces = []
+        for start, end, start_rate, end_rate, pattern in self.segments():
+            # Long or busy windows are split so no piece expects more than CHUNK passengers
+            n_pieces = max(1, math.ceil((start_rate + end_rate) / 2 * (end - start) / CHUNK))
+            edges = np.linspace(start, end, n_pieces + 1)
+            rates = start_rate + (end_rate - start_rate) * (edges - start) / (end - start)
+            for a, b, rate_a, rate_b in zip(edges[:-1], edges[1:], rates[:-1], rates[1:]):
+                pieces.append((a, b, rate_a, rate_b, pattern))
+
+        counts = rng.poisson([(rate_a + rate_b) / 2 * (b - a) for a, b, rate_a, rate_b, _ in pieces])
+        total = int(counts.sum())
+
+        if path is None:
+            records = np.empty(total, dtype=TRACE_DTYPE)
+        else:
+            path = trace_path(path)
+            records = open_memmap(path, mode='w+', dtype=TRACE_DTYPE, shape=(total,))
+
+        matrices = {}
+        written = 0
+        for (a, b, rate_a, rate_b, pattern), count in zip(pieces, counts.tolist()):
+            if not count:
+                continue
+            key = id(pattern) if not isinstance(pattern, str) else pattern
+            if key not in matrices:
+                matrices[key] = od_matrix(pattern, floors)
+
+            piece = records[written:written + count]
+            piece['time'] = arrival_times(a, b, rate_a, rate_b, count, rng)
+            piece['step'] = np.floor(piece['time'])  # Unused by the tick engine, which releases profile arrivals by its clock
+            piece['origin'], piece['destination'] = od_pairs(matrices[key], count, rng)
+            written += count
+
+        if path is not None:
+            records.flush()
+            del records
+            return load_trace(path)
+        return Trace(records['step'], records['origin'], records['destination'], records['time'])
+
+    def to_dict(self):
+        return {'windows': [[start, rate, pattern if isinstance(pattern, str) else np.asarray(pattern).tolist()]
+                            for start, rate, pattern in self.windows],
+                'end': self.end, 'interpolate': self.interpolate}
+
+    @classmethod
+    def from_dict(cls, profile):
+        return cls([tuple(window) for window in profile['windows']], profile['end'], profile['interpolate'])
+
+
+def arrival_times(start, end, start_rate, end_rate, count, rng):
+    # Sorted arrival times of count passengers in [start, end) when the rate changes linearly from start_rate to
+    # end_rate - uniform draws of the cumulative rate are mapped back through its inverse (a quadratic), so every
+    # draw is used, unlike thinning
+    length = end - start
+    slope = (end_rate - start_rate) / length
+    cumulative = np.sort(rng.uniform(0, (start_rate + end_rate) / 2 * length, size=count))
+    offset = 2 * cumulative / (start_rate + np.sqrt(np.maximum(start_rate ** 2 + 2 * slope * cumulative, 0)))
+    return start + np.minimum(offset, np.nextafter(length, 0))
+
+
+def od_matrix(pattern, floors):
+    # Probability of each (origin, destination) pair of floors for a pattern, never with the same origin and
+    # destination. The named patterns match the modes of generate_floors
+    others = (1 - np.eye(floors)) / (floors - 1)  # Each other floor is as likely as a destination or origin
+    if isinstance(pattern, str):
+        if pattern == "random":
+            matrix = others / floors
+        elif pattern == "morning":
+            matrix = floor_weights(floors, floors * 4)[:, None] * others
+        elif pattern == "evening":
+            matrix = others * floor_weights(floors, floors * 9)[None, :]
+        elif pattern == "lunch":  # Half going out for lunch and half coming back
+            matrix = (od_matrix("morning", floors) + od_matrix("evening", floors)) / 2
+        else:
+            raise Exception(f"Unknown traffic pattern {pattern}")
+    else:
+        matrix = np.array(pattern, dtype=float)
+        if matrix.shape != (floors, floors) or (matrix < 0).any():
+            raise Exception(f"An origin/destination matrix must be {floors} x {floors} non-negative weights")
+        np.fill_diagonal(matrix, 0)
+    return matrix / matrix.sum()
+
+
+def od_pairs(matrix, count, rng):
+    floors = len(matrix)
+    pair = rng.choice(floors * floors, size=count, p=matrix.ravel())
+    return pair // floors, pair % floors
+
+
+def office_day(scale=1.0, interpolate=True):
+    # A day in an office block of around a thousand people - quiet night, morning peak, lunch and evening peak. The
+    # peaks need a group of lifts (n_cars) to keep up
+    hour = 3600
+    return TrafficProfile([
+        (0, 0.005, "random"),
+        (6 * hour, 0.05, "morning"),
+        (7 * hour, 0.5, "morning"),
+        (9.5 * hour, 0.1, "random"),
+        (12 * hour, 0.3, "lunch"),
+        (14 * hour, 0.1, "random"),
+        (16.5 * hour, 0.5, "evening"),
+        (18.5 * hour, 0.05, "evening"),
+        (22 * hour, 0.005, "random"),
+    ], 24 * hour, interpolate).scale(scale)
+
+
+PROFILES = {'office_day': office_day}
+
+
+def get_profile(profile):
+    # A TrafficProfile from the profile config - a profile, the name of a built in one or a saved to_dict
+    if isinstance(profile, TrafficProfile):
+        return profile
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise Exception(f"Unknown traffic profile {profile}")
+        return PROFILES[profile]()
+    return TrafficProfile.from_dict(profile)
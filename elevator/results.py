@@ -0,0 +1,105 @@
+import json
+import numpy as np
+import os
+
+# Layout of every row written by a ResultSink - one row per passenger per simulation
+RESULT_DTYPE = np.dtype([('iteration', np.int32), ('passenger', np.int32), ('journey_time', np.float64),
+                         ('in_elevator_time', np.float64)])
+
+
+class ResultSink:
+    def __init__(self, directory, algo_names, chunk_size=65536):
+        # Appends the results of each simulation to per-algorithm buffers and writes them out as .npy shards of
+        # chunk_size rows, so a sweep never holds more than one chunk per algorithm in memory
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.buffers = {name: [] for name in algo_names}
+        self.buffered_rows = {name: 0 for name in algo_names}
+        self.shards = {name: [] for name in algo_names}
+        self.rows = {name: 0 for name in algo_names}
+
+        os.makedirs(directory, exist_ok=True)
+        for file in os.listdir(directory):  # Clear out the results of a previous run
+            if file.endswith(".npy") or file == "manifest.json":
+                os.remove(os.path.join(directory, file))
+
+    def append(self, algo_name, iteration, journey_times, in_elevator_times):
+        records = np.empty(len(journey_times), dtype=RESULT_DTYPE)
+        records['iteration'] = iteration
+        records['passenger'] = np.arange(len(journey_times))
+        records['journey_time'] = journey_times
+        records['in_elevator_time'] = in_elevator_times
+
+        self.buffers[algo_name].append(records)
+        self.buffered_rows[algo_name] += len(records)
+        if self.buffered_rows[algo_name] >= self.chunk_size:
+            self.flush(algo_name)
+
+    def flush(self, algo_name):
+        if not self.buffered_rows[algo_name]:
+            return
+        records = np.concatenate(self.buffers[algo_name])
+        shard = f"{algo_name}_{len(self.shards[algo_name]):05d}.npy"
+        np.save(os.path.join(self.directory, shard), records)
+        self.shards[algo_name].append(shard)
+        self.rows[algo_name] += len(records)
+        self.buffers[algo_name] = []
+        self.buffered_rows[algo_name] = 0
+
+    def close(self):
+        for algo_name in self.buffers:
+            self.flush(algo_name)
+        with open(os.path.join(self.directory, "manifest.json"), 'w') as f:
+            json.dump({'shards': self.shards, 'rows': self.rows}, f)
+
+
+class ResultReader:
+    def __init__(self, directory):
+        # Reads back the shards written by a ResultSink one at a time through memory maps
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.shards = manifest['shards']
+        self.rows = manifest['rows']
+
+    @property
+    def algos(self):
+        return list(self.shards)
+
+    def chunks(self, algo_name):
+        for shard in self.shards[algo_name]:
+            yield np.load(os.path.join(self.directory, shard), mmap_mode='r')
+
+    def column(self, algo_name, field):
+        # Loads a whole column for one algorithm - only use this when it fits in memory
+        return np.concatenate([chunk[field] for chunk in self.chunks(algo_name)])
+
+    def summary(self):
+        # Count, mean and max of both times for every algorithm, computed a chunk at a time
+        summary = {}
+        for algo_name in self.algos:
+            stats = {'count': 0}
+            for field in ['journey_time', 'in_elevator_time']:
+                total, maximum = 0.0, -np.inf
+                for chunk in self.chunks(algo_name):
+                    total += float(np.sum(chunk[field]))
+                    maximum = max(maximum, float(np.max(chunk[field], initial=-np.inf)))
+                stats[f"mean_{field}"] = total / self.rows[algo_name] if self.rows[algo_name] else np.nan
+                stats[f"max_{field}"] = maximum
+            stats['count'] = self.rows[algo_name]
+            summary[algo_name] = stats
+        return summary
+
+    def to_dataframes(self):
+        # Journey and in lift times as DataFrames indexed by (iteration, passenger) with a column per algorithm
+        import pandas as pd  # Only needed when the results are turned into tables
+
+        frames = {}
+        for field in ['journey_time', 'in_elevator_time']:
+            columns = {}
+            for algo_name in self.algos:
+                records = np.concatenate(list(self.chunks(algo_name)))
+                index = pd.MultiIndex.from_arrays([records['iteration'], records['passenger']])
+                columns[algo_name] = pd.Series(records[field], index=index).sort_index()
+            frames[field] = pd.DataFrame(columns)
+        return frames['journey_time'], frames['in_elevator_time']
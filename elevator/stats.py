@@ -0,0 +1,130 @@
+import math
+import numpy as np
+
+
+class RunningStats:
+    def __init__(self):
+        # Count, mean and variance kept up to date with Welford's method, so no values need to be stored
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared differences from the mean
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        batch = RunningStats()
+        batch.count = len(values)
+        batch.mean = float(np.mean(values))
+        batch.m2 = float(np.sum((values - batch.mean) ** 2))
+        batch.minimum = float(np.min(values))
+        batch.maximum = float(np.max(values))
+        self.merge(batch)
+
+    def merge(self, other):
+        # Combines the statistics of two sets of values (Chan et al.)
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=0.01):
+        # DDSketch - values are counted in logarithmically sized bins so any quantile can be estimated to within
+        # relative_accuracy of its true value, using memory that depends on the range of the values not how many
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = 1e-9  # Anything smaller (e.g. passengers who waited 0 seconds) is counted as zero
+        self.bins = {}  # Bin index: number of values in the bin
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        zero = values <= self.min_value
+        self.zero_count += int(np.sum(zero))
+        self.count += len(values)
+
+        keys = np.ceil(np.log(values[~zero]) / self.log_gamma).astype(np.int64)
+        for key, count in zip(*(a.tolist() for a in np.unique(keys, return_counts=True))):
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise Exception("Can only merge sketches with the same relative accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        cumulative = self.zero_count
+        for key in sorted(self.bins):
+            cumulative += self.bins[key]
+            if cumulative > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)  # Middle of the bin in relative terms
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+
+class Summary:
+    def __init__(self, relative_accuracy=0.01):
+        # Running statistics and quantiles for one measurement, e.g. the journey times of one algorithm
+        self.stats = RunningStats()
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, values):
+        self.stats.add(values)
+        self.sketch.add(values)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+
+    def to_dict(self, percentiles=(50, 95, 99)):
+        summary = {'count': self.stats.count, 'mean': self.stats.mean, 'std': self.stats.std,
+                   'min': self.stats.minimum, 'max': self.stats.maximum}
+        for p in percentiles:
+            summary[f"p{p}"] = self.sketch.quantile(p / 100)
+        return summary
+
+
+class TimeSummary:
+    def __init__(self):
+        # Summaries of the journey and in lift times of one algorithm in one scenario
+        self.journey = Summary()
+        self.elevator = Summary()
+
+    def add(self, journey_times, in_elevator_times):
+        self.journey.add(journey_times)
+        self.elevator.add(in_elevator_times)
+
+    def merge(self, other):
+        self.journey.merge(other.journey)
+        self.elevator.merge(other.elevator)
+
+    def to_dict(self):
+        return {'journey': self.journey.to_dict(), 'elevator': self.elevator.to_dict()}
@@ -0,0 +1,180 @@
+import itertools
+import json
+import math
+import numpy as np
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from elevator.cache import result_cache
+from elevator.functions import cached_cells, run_task, task_seed, test_jobs
+from elevator.stats import RunningStats, TimeSummary
+from statistics import NormalDist
+
+
+class Candidate:
+    def __init__(self, overrides, config):
+        # One point of a sweep - the config with its overrides applied, and what its runs have scored so far
+        self.overrides = overrides
+        self.config = dict(config, **{key: value for key, value in overrides.items() if key != 'algo'})
+        self.config.update(draw=False, keep_results=False, record_trace=None)  # Workers only send back summaries
+        self.algo = overrides['algo']()
+        self.summary = TimeSummary()
+        self.run_means = {'journey': RunningStats(), 'elevator': RunningStats()}  # Mean of each run
+        self.iterations = 0
+        self.stopped_at = None  # Iterations it had run when it was stopped early
+
+    def add(self, summary):
+        self.summary.merge(summary)
+        self.run_means['journey'].add([summary.journey.stats.mean])
+        self.run_means['elevator'].add([summary.elevator.stats.mean])
+        self.iterations += 1
+
+    def interval(self, metric, z):
+        # Confidence interval of the mean of the runs, treating every run as an independent sample
+        stats = self.run_means[metric]
+        half_width = z * stats.std / math.sqrt(stats.count) if stats.count > 1 else math.inf
+        return stats.mean - half_width, stats.mean + half_width
+
+    def to_dict(self, metric, z):
+        return {
+            'overrides': normalise_overrides(self.overrides),
+            'iterations': self.iterations,
+            'stopped_at': self.stopped_at,
+            metric: self.run_means[metric].mean,
+            'interval': list(self.interval(metric, z)),
+            'summary': self.summary.to_dict(),
+        }
+
+
+def grid(space):
+    # Every combination of the values listed for each key
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+
+
+def random_search(space, n_samples, rng):
+    # n_samples random points - each key takes one of its listed values, or a draw from it if it is a function of
+    # the random generator, e.g. lambda rng: rng.uniform(1, 2)
+    def draw(values):
+        if callable(values):
+            return values(rng)
+        return values[rng.integers(len(values))]
+
+    return [{key: draw(values) for key, values in space.items()} for _ in range(n_samples)]
+
+
+def sweep(name, config, space, search="grid", n_samples=20, min_iterations=4, max_iterations=None, eta=3,
+          confidence=0.95, metric='journey', pool=None):
+    # Finds the config overrides (and algorithm, under 'algo') with the lowest mean time. Every candidate starts with
+    # min_iterations runs, then in each round the ones whose confidence intervals clearly lose to the best are
+    # stopped, at most 1/eta of the rest carry on, and the survivors run eta times as many iterations, up to
+    # max_iterations. Candidates share seeds, so they are compared on the same passengers
+    if config.get("seed") is None:
+        config = dict(config, seed=np.random.SeedSequence().entropy)
+    max_iterations = max_iterations or config["iterations"]
+
+    space = dict(space)
+    space.setdefault('algo', config["algos"])
+    if search == "grid":
+        points = grid(space)
+    elif search == "random":
+        points = random_search(space, n_samples, np.random.default_rng(config["seed"]))
+    else:
+        raise Exception("Incorrect search supplied")
+
+    candidates = [Candidate(overrides, config) for overrides in points]
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    workers = config.get("workers", 1)
+
+    ts = time.time()
+    if pool is None and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as sweep_pool:
+            survivors = successive_halving(candidates, min_iterations, max_iterations, eta, metric, z, sweep_pool)
+    else:
+        survivors = successive_halving(candidates, min_iterations, max_iterations, eta, metric, z, pool)
+
+    ranking = sorted(candidates, key=lambda c: (c.stopped_at is not None, c.run_means[metric].mean))
+    simulations = sum(c.iterations for c in candidates)
+    result = {
+        'best': ranking[0].to_dict(metric, z),
+        'candidates': [c.to_dict(metric, z) for c in ranking],
+        'survivors': len(survivors),
+        'simulations': simulations,
+        'full_grid_simulations': len(candidates) * max_iterations,
+        'seed': config["seed"],
+        'time': time.time() - ts,
+    }
+
+    print(f"Sweep {name}: best {result['best']['overrides']} with mean {metric} time "
+          f"{round(result['best'][metric], 1)} (seconds)")
+    print(f"{simulations} simulations instead of {result['full_grid_simulations']} for the full grid")
+
+    os.makedirs(f"output/{name}", exist_ok=True)
+    with open(f"output/{name}/sweep.json", 'w') as f:
+        json.dump(result, f, indent=2)
+
+    return result
+
+
+def successive_halving(candidates, min_iterations, max_iterations, eta, metric, z, pool):
+    survivors = list(candidates)
+    iterations = min(min_iterations, max_iterations)
+
+    while True:
+        run_iterations(survivors, iterations, pool)
+        if iterations >= max_iterations or len(survivors) == 1:
+            return survivors
+
+        # Stop the candidates whose interval lies wholly above the best one's, then keep the best 1/eta of the rest
+        best_upper = min(c.interval(metric, z)[1] for c in survivors)
+        contenders = sorted((c for c in survivors if c.interval(metric, z)[0] <= best_upper),
+                            key=lambda c: c.run_means[metric].mean)
+        keep = contenders[:max(1, math.ceil(len(survivors) / eta))]
+        for c in survivors:
+            if c not in keep:
+                c.stopped_at = c.iterations
+        survivors = keep
+        iterations = min(iterations * eta, max_iterations)
+
+
+def run_iterations(candidates, iterations, pool):
+    # Brings every candidate up to the given number of iterations, using cached results where there are any
+    jobs = []
+    for candidate in candidates:
+        cells = [(candidate.algo, i) for i in range(candidate.iterations, iterations)]
+        cached, missing = cached_cells(candidate.config, cells, result_cache(candidate.config))
+        for _, _, summary in cached:
+            candidate.add(summary)
+        jobs += [(candidate, job_iterations) for _, job_iterations in test_jobs(candidate.config, missing)]
+
+    def seeds(candidate, job_iterations):
+        return [task_seed(candidate.config["seed"], i) for i in job_iterations]
+
+    if pool is None:
+        for candidate, job_iterations in jobs:
+            results, _ = run_task(candidate.config, type(candidate.algo), seeds(candidate, job_iterations))
+            for summary in results:
+                candidate.add(summary)
+        return
+
+    futures = {pool.submit(run_task, candidate.config, type(candidate.algo), seeds(candidate, job_iterations)):
+               candidate for candidate, job_iterations in jobs}
+    for future in as_completed(futures):
+        results, _ = future.result()
+        for summary in results:
+            futures[future].add(summary)
+
+
+def normalise_overrides(overrides):
+    # Overrides as they can be written to JSON, with classes by name
+    normalised = {}
+    for key, value in overrides.items():
+        if isinstance(value, type):
+            value = value.__name__
+        elif isinstance(value, np.generic):
+            value = value.item()
+        elif isinstance(value, tuple):
+            value = list(value)
+        normalised[key] = value
+    return normalised
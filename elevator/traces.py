@@ -0,0 +1,114 @@
+import numpy as np
+import os
+
+
+class Trace:
+    def __init__(self, step, origin, destination, time=None):
+        # Every passenger of a simulation, sorted by the iteration they arrive on
+        self.step = step  # Iteration of the simulation the passenger is created on
+        self.origin = origin  # Floor they start on
+        self.destination = destination  # Floor they want to get to
+        self.time = step.astype(float) if time is None else time  # Second they arrive at, used by the event engine
+
+    def __len__(self):
+        return len(self.origin)
+
+    def arrivals(self, start, step):
+        # Index one past the last passenger arriving on or before the given iteration, searching from start
+        return start + int(np.searchsorted(self.step[start:], step, side='right'))
+
+
+def single_lift_run(config):
+    # Whether a simulation of the config has one lift, nothing drawn and passengers arriving by iteration rather than
+    # by the clock as they do from a traffic profile - the runs the compiled and batched engines cover
+    return config.get('n_cars', 1) == 1 and not config['draw'] and config.get('profile') is None
+
+
+def generate_trace(config, rng):
+    # Generates all the passengers of a simulation at once rather than one at a time inside the main loop
+    n_passengers = config['n_passengers']
+
+    step = generate_steps(n_passengers, *config['generate_range'], rng)
+    origin, destination = generate_floors(n_passengers, config['n_floors'], config['mode'], rng)
+
+    time = None
+    if config.get('arrival_rate'):  # Poisson arrivals in real seconds for the event engine
+        time = np.cumsum(rng.exponential(1 / config['arrival_rate'], size=n_passengers))
+
+    return Trace(step, origin, destination, time)
+
+
+def generate_steps(n_passengers, low, high, rng):
+    # Number of passengers spawned each iteration is drawn from the generate range until all have been spawned
+    if not n_passengers:
+        return np.empty(0, dtype=np.int64)
+
+    counts = np.empty(0, dtype=np.int64)
+    chunk = max(n_passengers, 16)
+
+    while counts.sum() < n_passengers:
+        counts = np.concatenate([counts, rng.integers(low, high + 1, size=chunk)])
+
+    total = np.cumsum(counts)
+    last = int(np.searchsorted(total, n_passengers))
+    counts = counts[:last + 1]
+    counts[last] -= total[last] - n_passengers  # The final iteration only spawns the passengers that are left
+
+    return np.repeat(np.arange(last + 1), counts)
+
+
+def generate_floors(n_passengers, floors, mode, rng):
+    if mode == "random":
+        origin = rng.integers(0, floors, size=n_passengers)
+        destination = other_floors(origin, floors, rng)
+    elif mode == "morning":  # Ground floor is weighted as (floors * 4) times more likely to be the origin
+        origin = rng.choice(floors, size=n_passengers, p=floor_weights(floors, floors * 4))
+        destination = other_floors(origin, floors, rng)
+    elif mode == "evening":  # Ground floor is weighted as (floors * 9) times more likely to be the destination
+        destination = rng.choice(floors, size=n_passengers, p=floor_weights(floors, floors * 9))
+        origin = other_floors(destination, floors, rng)
+    else:
+        raise Exception("Incorrect mode supplied")
+    return origin, destination
+
+
+def floor_weights(floors, ground_weight):
+    weights = np.ones(floors)
+    weights[0] = ground_weight
+    return weights / weights.sum()
+
+
+def other_floors(floor, floors, rng):
+    # Uniformly picks a floor different from the one given for every passenger
+    other = rng.integers(0, floors - 1, size=len(floor))
+    return other + (other >= floor)
+
+
+# Layout of a saved trace - one record per passenger so multi-million passenger traces can be memory mapped
+TRACE_DTYPE = np.dtype([('step', np.int64), ('origin', np.int32), ('destination', np.int32), ('time', np.float64)])
+
+
+def trace_path(path):
+    # Traces are always .npy files - the extension is added here the way np.save adds it, so a trace recorded to a
+    # path can be replayed from the same path however it was written
+    path = os.fspath(path)
+    return path if path.endswith('.npy') else path + '.npy'
+
+
+def save_trace(path, trace):
+    records = np.empty(len(trace), dtype=TRACE_DTYPE)
+    records['step'] = trace.step
+    records['origin'] = trace.origin
+    records['destination'] = trace.destination
+    records['time'] = trace.time
+    np.save(trace_path(path), records)
+
+
+def load_trace(path):
+    # The file is memory mapped, so passengers are only read from disk as the simulation reaches them
+    path = trace_path(path)
+    records = np.load(path, mmap_mode='r')
+    if records.dtype.names is None or not {'step', 'origin', 'destination'}.issubset(records.dtype.names):
+        raise Exception(f"{path} is not a passenger trace")
+    time = records['time'] if 'time' in records.dtype.names else None  # Traces saved before arrival times were added
+    return Trace(records['step'], records['origin'], records['destination'], time)
@@ -1,5 +1,6 @@
 from elevator.algorithms import BasicAlgorithm, SimpleUpDown, ClosestFloor, NormalLift, \
     LongestWaited, PopularFloor  # Import your algorithm from the algorithms file here
+from elevator.dispatchers import NearestCar, LeastBusy, RoundRobin
 from elevator.classes import Elevator, Passenger, Building
 from elevator.functions import run_simulation, charts, run_iteration, generate_passenger, time_method, run_test, \
     batch_test
@@ -17,8 +18,23 @@ def main():
         generate_range=(0, 2),  # Range of passengers to spawn each iteration
         acceleration=1.5,  # Acceleration/deceleration of lift (ms^-2)
         max_speed=6.7,  # Max speed of lift (ms^-1)
-        storey_height=4,  # Height of building storey (m)
+        storey_height=4,  # Height of building storey (m) - or a list with the height of each storey from the ground up
         embark_disembark_time=1,  # Time for each passenger to get on/off (s)
+        n_cars=1,  # Number of lifts in the group - each runs its own copy of the algorithm
+        dispatcher=NearestCar,  # How hall calls are shared out between the lifts when there is more than one
+        engine="tick",  # tick (the lift moves once per iteration - a group of lifts or a profile runs in real time, each lift on its own clock), compiled (tick engine compiled with Numba if installed), batched (many runs of the tick engine in lockstep) or event (real time, jumping between events)
+        batch_size=None,  # Iterations run together by the batched engine - None runs them all in one batch
+        profile=None,  # Traffic profile to generate arrivals from instead of mode/n_passengers/generate_range - a TrafficProfile or the name of a built in one, e.g. "office_day". The compiled and batched engines fall back to the tick engine for profiles
+        arrival_rate=None,  # Passengers arriving per second for the event engine - None spawns one iteration's worth per second
+        seed=None,  # Base seed - each iteration gets its own random stream from it, shared by every algorithm. None picks one and saves it in config.json
+        workers=1,  # Number of worker processes to spread the simulations over
+        trace=None,  # Path of a saved passenger trace (.npy) to replay instead of generating passengers
+        record_trace=None,  # Path to save the passenger trace of the first iteration of a test to
+        chunk_size=65536,  # Rows of results buffered per algorithm before they are written to output/<name>/results
+        instrument=False,  # Time each phase of the simulations and the algorithms' decisions into output/<name>/instrumentation.json
+        cache=None,  # Directory to cache the results of each simulation in, so re-runs with the same seed only simulate what is new - e.g. "output/cache"
+        cache_size=2 ** 30,  # Most bytes the cache can use before the least recently used results are removed
+        keep_results=True,  # Keep every passenger's times for the CSVs and charts - False only keeps summary.json statistics
     )
 
     batch_test(config)
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from elevator import batched
+from elevator.algorithms import SimpleUpDown, ClosestFloor, NormalLift, LongestWaited, PopularFloor
+from elevator.engine import EventEngine
+from elevator.functions import make_trace, run_engine
+from elevator.profiles import office_day
+
+ALGORITHMS = [SimpleUpDown, ClosestFloor, NormalLift, LongestWaited, PopularFloor]
+MODES = ["morning", "evening", "random"]
+SEEDS = range(3)
+MAX_EVENT_DIFFERENCE = 0.05  # Most the tick engine's mean journey time may differ from the event engine's in real time
+MAX_GROUP_DIFFERENCE = 0.15  # Same for a group of lifts, whose runs spread further as the lifts pick their next floor
+# when their doors open on the tick engine but once everyone has got on on the event engine
+BUILDINGS = [  # (floors, max occupancy, passengers, generate range) - a small busy building and a tall quiet one
+    (5, 3, 120, (0, 3)),
+    (20, 12, 200, (0, 2)),
+]
+
+
+def make_config(floors, max_occupancy, n_passengers, generate_range, mode, engine):
+    return dict(mode=mode, draw=False, max_occupancy=max_occupancy, n_floors=floors, n_passengers=n_passengers,
+                generate_range=generate_range, acceleration=1.5, max_speed=6.7, storey_height=4,
+                embark_disembark_time=1, engine=engine)
+
+
+def times(total_passengers):
+    return total_passengers.journey_times(), total_passengers.in_elevator_times()
+
+
+def assert_same(expected, actual):
+    # Bitwise identical, not just close
+    for a, b in zip(expected, actual):
+        assert np.array_equal(np.asarray(a), np.asarray(b))
+
+
+@pytest.mark.parametrize("algo_class", ALGORITHMS, ids=lambda algo_class: algo_class.__name__)
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("building", BUILDINGS, ids=str)
+def test_compiled_matches_tick(building, mode, algo_class):
+    pytest.importorskip("numba")
+    for seed in SEEDS:
+        config = make_config(*building, mode, 'compiled')
+        trace = make_trace(config, np.random.default_rng(seed))
+        assert_same(times(run_engine(dict(config, engine='tick'), algo_class(), trace)),
+                    times(run_engine(config, algo_class(), trace)))
+
+
+@pytest.mark.parametrize("algo_class", ALGORITHMS, ids=lambda algo_class: algo_class.__name__)
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("building", BUILDINGS, ids=str)
+def test_batched_matches_tick(building, mode, algo_class):
+    config = make_config(*building, mode, 'batched')
+    traces = [make_trace(config, np.random.default_rng(seed)) for seed in SEEDS]
+    results = batched.run_batch(config, algo_class(), traces)
+    for trace, result in zip(traces, results):
+        assert_same(times(run_engine(dict(config, engine='tick'), algo_class(), trace)), result)
+
+
+@pytest.mark.parametrize("algo_class", ALGORITHMS, ids=lambda algo_class: algo_class.__name__)
+def test_tick_matches_event_on_profile(algo_class):
+    # A whole office day with one lift, so the lobby queue builds up to thousands of people at the peaks
+    config = dict(make_config(10, 12, 0, (0, 2), "morning", 'tick'), profile=office_day())
+    trace = make_trace(config, np.random.default_rng(0))
+    tick = np.mean(run_engine(config, algo_class(), trace).journey_times())
+    event = np.mean(EventEngine(config, algo_class(), trace).run().journey_times())
+    assert abs(tick - event) <= MAX_EVENT_DIFFERENCE * event
+
+
+@pytest.mark.parametrize("n_cars", [2, 4])
+@pytest.mark.parametrize("algo_class", ALGORITHMS, ids=lambda algo_class: algo_class.__name__)
+def test_tick_matches_event_with_groups(algo_class, n_cars):
+    # The lifts of a group move independently, so none of them is held up waiting for the others
+    config = dict(make_config(20, 12, 0, (0, 2), "morning", 'tick'), profile=office_day(0.5), n_cars=n_cars)
+    tick, event = [], []
+    for seed in SEEDS:
+        trace = make_trace(config, np.random.default_rng(seed))
+        tick.append(np.mean(run_engine(config, algo_class(), trace).journey_times()))
+        event.append(np.mean(EventEngine(config, algo_class(), trace).run().journey_times()))
+    assert abs(np.mean(tick) - np.mean(event)) <= MAX_GROUP_DIFFERENCE * np.mean(event)
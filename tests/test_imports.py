@@ -0,0 +1,12 @@
+import pytest
+
+from elevator.bench import CORE_MODULES, IMPORT_BUDGET, import_time
+
+
+@pytest.mark.parametrize("module", CORE_MODULES)
+def test_import_budget(module):
+    # Each core module is imported in a fresh interpreter, so nothing loaded by the tests themselves counts
+    result = import_time(module, 3)
+    assert result['import_time'] <= IMPORT_BUDGET, f"{module} took {result['import_time']:.3f}s to import"
+    assert not result['heavy_modules'], f"{module} loaded {', '.join(result['heavy_modules'])}"
+
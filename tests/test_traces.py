@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from elevator.functions import make_trace
+from elevator.profiles import office_day
+
+CONFIG = dict(mode="morning", n_floors=10, n_passengers=50, generate_range=(0, 2))
+
+
+@pytest.mark.parametrize("profile", [None, office_day(0.01)], ids=["generated", "profile"])
+@pytest.mark.parametrize("name", ["day", "day.npy"])
+def test_recorded_trace_replays(tmp_path, profile, name):
+    # A trace recorded to a path, with or without the extension, is replayed from the same path
+    path = str(tmp_path / name)
+    recorded = make_trace(dict(CONFIG, profile=profile, record_trace=path), np.random.default_rng(0))
+    replayed = make_trace(dict(CONFIG, profile=profile, trace=path), np.random.default_rng(1))
+    for column in ['step', 'origin', 'destination', 'time']:
+        assert np.array_equal(getattr(recorded, column), getattr(replayed, column))